@@ -1,49 +1,138 @@
+import math
 import numpy as np
-from scipy.stats import norm
 from api_connect import finance_api
+from instrumentation import metrics, timed
+from pricing import PRICE_GREEKS, bs_price_greeks, norm_cdf, norm_pdf
+from positions import PositionStore
+from scenario_cube import CubeBuilder
+from montecarlo import mc_price
 import pandas as pd
-import yfinance as yf
-from bokeh.models import ColumnDataSource
-from bokeh.models.widgets import DataTable, TableColumn
-from bokeh.plotting import figure
+
+
+class _PricingInput:
+    # attribute of Option whose change clears the memoized price and greeks
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj, self.slot)
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+        obj._cache = None
+
+
+def _memoized(fonc):
+    # read-only attribute computed on first access
+    name = fonc.__name__
+
+    def getter(self):
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = {}
+        elif name in cache:
+            return cache[name]
+        out = cache[name] = fonc(self)
+        return out
+    return property(getter)
 
 
 class Option:
+    __slots__ = ("_S_0", "_K", "_T", "_sigma", "_r", "_q", "_option_type",
+                 "maturity_date", "MCprice", "_cache")
+
+    S_0 = _PricingInput()
+    K = _PricingInput()
+    T = _PricingInput()
+    sigma = _PricingInput()
+    r = _PricingInput()
+    q = _PricingInput()
+    option_type = _PricingInput()
+
     def __init__(self, S_0, K, T, sigma, r, q,
                  option_type="Call",
                  maturity_date=None):
         # inputs
-        self.S_0 = S_0
-        self.K = K
-        self.T = T / 365
-        self.sigma = sigma
-        self.r = r
-        self.q = q
-        self.option_type = option_type
+        self._S_0 = S_0
+        self._K = K
+        self._T = T / 365
+        self._sigma = sigma
+        self._r = r
+        self._q = q
+        self._option_type = option_type
         self.maturity_date = maturity_date
-        self.BSprice = None
         self.MCprice = None
+        self._cache = None
+        if metrics.enabled:
+            metrics.count("Option.constructions")
 
-        # Greeks
-        T = T / 365
-        d_1 = (((np.log(S_0/K) + (r + 0.5 * sigma**2) * T))
-               / (sigma * np.sqrt(T)))
-        d_2 = d_1 - sigma * np.sqrt(T)
+    # Greeks, computed on first access
+    @_memoized
+    def _d(self):
+        S_0, K, T, sigma, r = self._S_0, self._K, self._T, self._sigma, self._r
+        if S_0 > 0 and K > 0 and T > 0 and sigma > 0:
+            sqrt_T = math.sqrt(T)
+            d_1 = (math.log(S_0 / K) + (r + 0.5 * sigma**2) * T)\
+                / (sigma * sqrt_T)
+        else:
+            # degenerate inputs give nan/inf as numpy does
+            with np.errstate(all='ignore'):
+                sqrt_T = np.sqrt(np.float64(T))
+                d_1 = (np.log(np.float64(S_0) / K)
+                       + (r + 0.5 * sigma**2) * T) / (sigma * sqrt_T)
+        return d_1, d_1 - sigma * sqrt_T, sqrt_T, norm_pdf(d_1)
 
+    @_memoized
+    def BSprice(self):
+        d_1, d_2, sqrt_T, pdf_d1 = self._d
+        disc = self._K * math.exp(-self._r * self._T)
         if self.option_type == "Call":
-            self.BSprice = S_0 * norm.cdf(d_1)\
-                - K * np.exp(-r * T) * norm.cdf(d_2)
-            self.Delta = norm.cdf(d_1)
-            self.Theta = (-((S_0 * sigma * norm.pdf(d_1)) / (2 * np.sqrt(T)))
-                          - r * K * np.exp(-r * T) * norm.cdf(d_2))/365
+            return self._S_0 * norm_cdf(d_1) - disc * norm_cdf(d_2)
         elif self.option_type == "Put":
-            self.BSprice = -S_0 * norm.cdf(-d_1)\
-                + K * np.exp(-r * T) * norm.cdf(-d_2)
-            self.Delta = -norm.cdf(-d_1)
-            self.Theta = (-((S_0 * sigma * norm.pdf(d_1)) / (2 * np.sqrt(T)))
-                          + r * K * np.exp(-r * T) * norm.cdf(-d_2))/365
-        self.Gamma = (1 / (S_0 * sigma * np.sqrt(T))) * norm.pdf(d_1)
-        self.Vega = S_0 * np.sqrt(T) * norm.pdf(d_1) * 0.01
+            return -self._S_0 * norm_cdf(-d_1) + disc * norm_cdf(-d_2)
+        return None
+
+    @_memoized
+    def Delta(self):
+        d_1 = self._d[0]
+        if self.option_type == "Call":
+            return norm_cdf(d_1)
+        elif self.option_type == "Put":
+            return -norm_cdf(-d_1)
+        return None
+
+    @_memoized
+    def Theta(self):
+        d_1, d_2, sqrt_T, pdf_d1 = self._d
+        r = self._r
+        disc = self._K * math.exp(-r * self._T)
+        decay = -(self._S_0 * self._sigma * pdf_d1) / (2 * sqrt_T)
+        if self.option_type == "Call":
+            return (decay - r * disc * norm_cdf(d_2)) / 365
+        elif self.option_type == "Put":
+            return (decay + r * disc * norm_cdf(-d_2)) / 365
+        return None
+
+    @_memoized
+    def Gamma(self):
+        d_1, d_2, sqrt_T, pdf_d1 = self._d
+        return (1 / (self._S_0 * self._sigma * sqrt_T)) * pdf_d1
+
+    @_memoized
+    def Vega(self):
+        d_1, d_2, sqrt_T, pdf_d1 = self._d
+        return self._S_0 * sqrt_T * pdf_d1 * 0.01
+
+    def monte_carlo(self, **kwargs):
+        # Monte Carlo price (see montecarlo.mc_price for the arguments),
+        # saved in MCprice. Returns the price and its standard error.
+        price, std_error = mc_price(self._S_0, self._K, self._T * 365,
+                                    self._sigma, self._r,
+                                    self.option_type == "Call", **kwargs)
+        self.MCprice = float(price[0])
+        return self.MCprice, float(std_error[0])
 
     def __str__(self):
         info = 'Type:          ' + self.option_type + \
@@ -55,14 +144,27 @@ class Option:
         return info
 
 
+def leg_label(option_type, K, T):
+    # key of a leg in the position store
+    return "{} , strike {}, {} days".format(option_type, K, T)
+
+
 class Strategy:
-    def __init__(self, ticker="AAPL", currency="EUR", stocks=0):
-        self.options_list = {}
+    def __init__(self, ticker="AAPL", currency="EUR", stocks=0,
+                 provider=None, service=None):
+        self.positions = PositionStore()
+        self._leg_values = (None, None)
+        self._grid = (None, None)
+        self._mc = (None, None)
+        # when use_cube is set, grids are read from a scenario cube built in
+        # the background (see scenario_cube.py)
+        self.use_cube = False
+        self.cube_builder = CubeBuilder(self)
         self.stocks = stocks
         self.ticker = ticker
-        self.source_currency = yf.Ticker(self.ticker).info['currency']
         self.currency = currency
-        self.api = finance_api(currency)
+        self.api = finance_api(currency, provider=provider, service=service)
+        self.source_currency = self.api.get_currency(self.ticker)
         self.S_0 = self.api.get_price(ticker, False)
         self.S_0_converted = self.api.get_price(ticker)
         self.q = self.api.get_div_yield(ticker)
@@ -70,265 +172,243 @@ class Strategy:
             self.q = 0
         self.r = 0
 
-        self.df_pnl = pd.SparseDataFrame
-        self.df_greeks = pd.SparseDataFrame
-
-        self.cds_options = ColumnDataSource()
-        self.cds_pnl = ColumnDataSource()
-        self.cds_greeks = ColumnDataSource()
-
-        self.columns_options = [TableColumn(field="Amount", title="Amount"),
-                                TableColumn(field="Option type",
-                                            title='Option type'),
-                                TableColumn(field="Maturity date",
-                                            title="Maturity"),
-                                TableColumn(field="Maturity",
-                                            title="Days to maturity"),
-                                TableColumn(field="Strike",
-                                            title="Strike"),
-                                TableColumn(field="Implied volatility",
-                                            title="Implied volatility (in %)"),
-                                TableColumn(field="Value", title="Value")]
-        self.columns_pnl = []
-        self.columns_greeks = []
-
-        self.options_table = DataTable(columns=self.columns_options,
-                                       source=self.cds_options)
-        self.pnl_table = DataTable(columns=self.columns_pnl,
-                                   source=self.cds_pnl)
-        self.greeks_table = DataTable(columns=self.columns_greeks,
-                                      source=self.cds_greeks)
-
-        self.pnl_fig = figure()
-        self.greeks_fig = figure()
+        self.df_options = pd.DataFrame()
+        self.df_pnl = pd.DataFrame()
+        self.df_greeks = pd.DataFrame()
 
     def add_option(self, K, T, sigma, option_type, amount, maturity_date=None):
-        opt_label = "{} , strike {}, {} days".format(option_type, K, T)
-        if opt_label in self.options_list:
-            if self.options_list[opt_label][0] + amount == 0:
-                del self.options_list[opt_label]
-            else:
-                self.options_list[opt_label][0] += amount
-        else:
-            self.options_list[opt_label] = [amount, Option(self.S_0, K, T,
-                                                           sigma, self.r,
-                                                           self.q, option_type,
-                                                           maturity_date)]
+        opt_label = leg_label(option_type, K, T)
+        with self.cube_builder.lock:
+            version = self.positions.version
+            stored = self.positions.row(opt_label)\
+                if opt_label in self.positions else None
+            self.positions.add(opt_label, amount, K, T, sigma,
+                               option_type == "Call", maturity_date)
+            self.cube_builder.leg_changed(version, amount, K, T, sigma,
+                                          option_type == "Call",
+                                          opt_label not in self.positions,
+                                          stored)
+
+    def load_legs(self, labels, columns):
+        # replaces all the legs at once (see storage.py), columns being
+        # {field: array} with the fields of the position store
+        with self.cube_builder.lock:
+            self.positions.load(labels, columns)
+
+    @property
+    def options_list(self):
+        # legacy view {label: [amount, Option]}, built on demand from the
+        # position store
+        p = self.positions
+        out = {label: [p.amount[i], Option(self.S_0, p.K[i], p.T[i],
+                                          p.sigma[i], self.r, self.q,
+                                          "Call" if p.is_call[i] else "Put",
+                                          p.maturity_date[i])]
+               for i, label in enumerate(p.labels)}
+        key, res = self._mc
+        if key == (p.version, self.S_0, self.r):
+            for i, (amount, opt) in enumerate(out.values()):
+                opt.MCprice = float(res["prices"][i])
+        return out
 
     def set_stock_quantity(self, n_stocks):
         self.stocks = n_stocks
 
-    def refresh(self):
+    @timed("Strategy.refresh_spot")
+    def refresh_spot(self):
         self.S_0 = self.api.get_price(self.ticker, False)
-        for opt_label in self.options_list:
-            self.options_list[opt_label][1].S_0 = self.S_0
-            self.options_list[opt_label][1].r = self.r
-            self.options_list[opt_label][1].q = self.q
+
+    def refresh(self):
+        self.refresh_spot()
         self.get_df_options()
 
+    def update_spot(self, S_0):
+        # all the legs are repriced at the new spot in one vectorized step
+        self.S_0 = S_0
+        return self.aggregates()
+
+    @timed("Strategy.aggregates")
+    def aggregates(self):
+        # price and greeks of the strategy at the current spot
+        amount = self.positions.amount
+        out = {name: float(values @ amount)
+               for name, values in self.leg_values().items()}
+        return self._add_stocks(out, self.S_0)
+
+    @timed("Strategy.reset")
     def reset(self, ticker):
         print(ticker, "here")
-        self.options_list = {}
+        with self.cube_builder.lock:
+            self.positions.clear()
         self.ticker = ticker
-        self.source_currency = yf.Ticker(self.ticker).info['currency']
+        self.source_currency = self.api.get_currency(self.ticker)
         self.S_0 = self.api.get_price(ticker, False)
         self.S_0_converted = self.api.get_price(ticker)
         self.q = self.api.get_div_yield(ticker)
         if self.q is None:
             self.q = 0
-        self.cds_options.data = {col.field: [] for col in self.columns_options}
+        self.df_options = pd.DataFrame()
         print(ticker, "success")
 
-    def Delta(self, S_0=0, shift_time=0, shift_vol=0):
-        if S_0 == 0 and shift_time == 0 and shift_vol == 0:
-            out = sum([self.options_list[o][1].Delta * self.options_list[o][0]
-                       for o in self.options_list]) + self.stocks
-        else:
-            if S_0 == 0:
-                S_0 = self.S_0
-            out = self.stocks +\
-                sum([Option(S_0, self.options_list[o][1].K,
-                            (365 * self.options_list[o][1].T) - shift_time,
-                            self.options_list[o][1].sigma + shift_vol,
-                            self.r, self.q,
-                            self.options_list[o][1].option_type).Delta
-                     * self.options_list[o][0] for o in self.options_list])
+    def legs(self):
+        # columns of the legs (views on the position store)
+        p = self.positions
+        return {"amount": p.amount, "K": p.K, "T": p.T, "sigma": p.sigma,
+                "is_call": p.is_call}
+
+    @timed("Strategy.leg_values")
+    def leg_values(self):
+        # price and greeks of each leg at the current spot, recomputed only
+        # when the legs, the spot or the rate changed
+        key = (self.positions.version, self.S_0, self.r)
+        if self._leg_values[0] != key:
+            p = self.positions
+            self._leg_values = (key, bs_price_greeks(self.S_0, p.K, p.T,
+                                                     p.sigma, self.r,
+                                                     p.is_call))
+        return self._leg_values[1]
+
+    @timed("Strategy.scenario")
+    def scenario(self, S_0=0, shift_time=0, shift_vol=0):
+        # price and greeks of the whole strategy, broadcast over the
+        # scenario inputs (spots equal to 0 are replaced by the current spot)
+        S_0 = np.asarray(S_0, dtype=float)
+        S_0 = np.where(S_0 == 0, self.S_0, S_0)
+        S_0, shift_time, shift_vol = np.broadcast_arrays(
+            S_0, np.asarray(shift_time, dtype=float),
+            np.asarray(shift_vol, dtype=float))
+        legs = self.legs()
+        res = bs_price_greeks(S_0[..., None], legs["K"],
+                              legs["T"] - shift_time[..., None],
+                              legs["sigma"] + shift_vol[..., None],
+                              self.r, legs["is_call"])
+        out = {name: res[name] @ legs["amount"] for name in PRICE_GREEKS}
+        return self._add_stocks(out, S_0)
+
+    @timed("Strategy.monte_carlo")
+    def monte_carlo(self, **kwargs):
+        # Monte Carlo prices of all the legs on the same paths (see
+        # montecarlo.mc_price for the arguments), with their standard errors,
+        # and value of the strategy. The prices are given to the MCprice of
+        # the options of options_list until the legs or the spot change.
+        p = self.positions
+        prices, std_errors = mc_price(self.S_0, p.K, p.T, p.sigma, self.r,
+                                      p.is_call, p.amount, **kwargs)
+        res = {"prices": prices[:-1], "std_errors": std_errors[:-1],
+               "value": float(prices[-1]) + self.S_0 * self.stocks,
+               "std_error": float(std_errors[-1])}
+        self._mc = ((p.version, self.S_0, self.r), res)
+        return res
+
+    def _add_stocks(self, out, S_0):
+        out["BSprice"] = out["BSprice"] + S_0 * self.stocks
+        out["Delta"] = out["Delta"] + self.stocks
         return out
 
+    def _aggregate(self, name, S_0, shift_time, shift_vol):
+        if np.ndim(S_0) == 0 and S_0 == 0 and np.ndim(shift_time) == 0\
+                and shift_time == 0 and np.ndim(shift_vol) == 0\
+                and shift_vol == 0:
+            out = float(self.leg_values()[name] @ self.positions.amount)
+            if name == "Delta":
+                out += self.stocks
+            elif name == "BSprice":
+                out += self.S_0 * self.stocks
+            return out
+        out = self.scenario(S_0, shift_time, shift_vol)[name]
+        return out if np.ndim(out) else float(out)
+
+    def Delta(self, S_0=0, shift_time=0, shift_vol=0):
+        return self._aggregate("Delta", S_0, shift_time, shift_vol)
+
     def Gamma(self, S_0=0, shift_time=0, shift_vol=0):
-        if S_0 == 0 and shift_time == 0 and shift_vol == 0:
-            out = sum([self.options_list[o][1].Gamma
-                       * self.options_list[o][0]
-                       for o in self.options_list])
-        else:
-            if S_0 == 0:
-                S_0 = self.S_0
-            out = sum([Option(S_0, self.options_list[o][1].K,
-                              (365 * self.options_list[o][1].T) - shift_time,
-                              self.options_list[o][1].sigma + shift_vol,
-                              self.r, self.q,
-                              self.options_list[o][1].option_type).Gamma
-                       * self.options_list[o][0] for o in self.options_list])
-        return out
+        return self._aggregate("Gamma", S_0, shift_time, shift_vol)
 
     def Vega(self, S_0=0, shift_time=0, shift_vol=0):
-        if S_0 == 0 and shift_time == 0 and shift_vol == 0:
-            out = sum([self.options_list[o][1].Vega * self.options_list[o][0]
-                       for o in self.options_list])
-        else:
-            if S_0 == 0:
-                S_0 = self.S_0
-            out = sum([Option(S_0, self.options_list[o][1].K,
-                              (365 * self.options_list[o][1].T) - shift_time,
-                              self.options_list[o][1].sigma + shift_vol,
-                              self.r, self.q,
-                              self.options_list[o][1].option_type).Vega
-                       * self.options_list[o][0] for o in self.options_list])
-        return out
+        return self._aggregate("Vega", S_0, shift_time, shift_vol)
 
     def Theta(self, S_0=0, shift_time=0, shift_vol=0):
-        if S_0 == 0 and shift_time == 0 and shift_vol == 0:
-            out = sum([self.options_list[o][1].Theta * self.options_list[o][0]
-                      for o in self.options_list])
-        else:
-            if S_0 == 0:
-                S_0 = self.S_0
-            out = sum([Option(S_0, self.options_list[o][1].K,
-                              (365*self.options_list[o][1].T) - shift_time,
-                              self.options_list[o][1].sigma + shift_vol,
-                              self.r, self.q,
-                              self.options_list[o][1].option_type).Theta
-                       * self.options_list[o][0] for o in self.options_list])
-        return out
+        return self._aggregate("Theta", S_0, shift_time, shift_vol)
 
     def price(self, S_0=0, shift_time=0, shift_vol=0, convert_currency=False):
-        if S_0 == 0 and shift_time == 0 and shift_vol == 0:
-            out = self.S_0 * self.stocks\
-                + sum([self.options_list[o][1].BSprice
-                       * self.options_list[o][0]
-                       for o in self.options_list])
-        else:
-            if S_0 == 0:
-                S_0 = self.S_0
-            out = S_0 * self.stocks\
-                + sum([Option(S_0, self.options_list[o][1].K,
-                              (365 * self.options_list[o][1].T) - shift_time,
-                              self.options_list[o][1].sigma + shift_vol,
-                              self.options_list[o][1].r,
-                              self.options_list[o][1].q,
-                              self.options_list[o][1].option_type).BSprice
-                       * self.options_list[o][0] for o in self.options_list])
+        out = self._aggregate("BSprice", S_0, shift_time, shift_vol)
         if convert_currency:
-            out = self.api.c_rates.convert(self.source_currency, self.currency,
-                                           out)
+            out = self.api.fx.convert(self.source_currency, self.currency,
+                                      out)
         return out
 
-    # print data frames
+    # data frames of the legs, and of the P&L and greeks over the Forward
+    # grid (shown by the Bokeh adapter of bokeh_view.py)
+    @timed("Strategy.get_df_options")
     def get_df_options(self):
-        self.cds_options.data = {col.field: [] for col in self.columns_options}
-        for opt_label in self.options_list:
-            o = self.options_list[opt_label]
-            self.cds_options.stream({"Amount": [o[0]],
-                                     "Option type": [o[1].option_type],
-                                     "Maturity date": [o[1].maturity_date],
-                                     "Maturity": [o[1].T * 365],
-                                     "Strike": [o[1].K],
-                                     "Implied volatility": [o[1].sigma * 100],
-                                     "Value": [o[1].BSprice * o[0]]})
-        self.options_table.source, self.options_table.columns =\
-            self.cds_options, self.columns_options
+        p = self.positions
+        values = self.leg_values()["BSprice"]
+        self.df_options = pd.DataFrame(
+            {"Amount": p.amount,
+             "Option type": np.where(p.is_call, "Call", "Put"),
+             "Maturity date": p.maturity_date,
+             "Maturity": p.T,
+             "Strike": p.K,
+             "Implied volatility": p.sigma * 100,
+             "Value": values * p.amount})
+        return self.df_options
+
+    @timed("Strategy.evaluate_grid")
+    def evaluate_grid(self, step, shift_time, shift_vol, nb_display=40):
+        # price and all the greeks over the Forward grid, for the
+        # instantaneous and the shifted scenario, in a single pass.
+        # The result is kept until one of its inputs changes, so that
+        # choosing another greek only slices it.
+        key = (self.positions.version, self.S_0, self.r, self.stocks, step,
+               shift_time, shift_vol, nb_display)
+        if self._grid[0] == key:
+            return self._grid[1]
+        forward = self.S_0 * (1 + step * (np.arange(nb_display + 1) - 20))
+        cube = self.cube_builder.ready() if self.use_cube else None
+        res = None
+        if cube is not None and cube.contains(forward, shift_time, shift_vol):
+            inst = cube.lookup(forward, 0, 0)
+            shifted = cube.lookup(forward, shift_time, shift_vol)
+            res = self._add_stocks({name: np.array([inst[name], shifted[name]])
+                                    for name in PRICE_GREEKS}, forward)
+            # priced directly where the cube has no finite value
+            if not all(np.isfinite(v).all() for v in res.values()):
+                res = None
+        if res is None:
+            res = self.scenario(forward, np.array([[0], [shift_time]]),
+                                np.array([[0], [shift_vol]]))
+        res["Forward"] = forward
+        res["base"] = self.price()
+        self._grid = (key, res)
+        return res
 
+    @timed("Strategy.get_df_pnl")
     def get_df_pnl(self, step, shift_time, shift_vol, nb_display=40):
+        grid = self.evaluate_grid(step, shift_time, shift_vol, nb_display)
         df_pnl = pd.DataFrame()
-        list_i = pd.Series([i for i in range(nb_display + 1)])
-        df_pnl['Forward'] = self.S_0 * (1 + step * (list_i - 20))
-        df_pnl['Instantaneous P&L'] =\
-            df_pnl['Forward'].apply(lambda u: self.price(u)) - self.price()
+        df_pnl['Forward'] = grid["Forward"]
+        df_pnl['Instantaneous P&L'] = grid["BSprice"][0] - grid["base"]
         df_pnl['P&L in {} days with {:.2f}% vol move'.format(shift_time,
                                                              shift_vol * 100)]\
-            = df_pnl['Forward'].apply(lambda u: self.price(u, shift_time,
-                                                           shift_vol))\
-            - self.price()
+            = grid["BSprice"][1] - grid["base"]
         df_pnl.dropna(axis=0, how='any', inplace=True)
         self.df_pnl = df_pnl
-        self.cds_pnl.data = {"Forward": df_pnl.iloc[:, 0],
-                             "Instantaneous": df_pnl.iloc[:, 1],
-                             "Future": df_pnl.iloc[:, 2]}
-        self.columns_pnl =\
-            [TableColumn(field="Forward", title="Forward"),
-             TableColumn(field="Instantaneous", title='Instantaneous P&L'),
-             TableColumn(field="Future",
-                         title='P&L in {} days with {:.2f}% vol move'.format(
-                             shift_time, shift_vol * 100))]
-        self.pnl_table.source, self.pnl_table.columns =\
-            self.cds_pnl, self.columns_pnl
+        return df_pnl
 
+    @timed("Strategy.get_df_greeks")
     def get_df_greeks(self, greek, step, shift_time, shift_vol, nb_display=40):
-        dict_fonc = {"Delta": self.Delta, "Gamma": self.Gamma,
-                     "Vega": self.Vega, "Theta": self.Theta}
+        grid = self.evaluate_grid(step, shift_time, shift_vol, nb_display)
         df_greeks = pd.DataFrame()
-        list_i = pd.Series([i for i in range(nb_display + 1)])
-        df_greeks['Forward'] = self.S_0 * (1 + step * (list_i - 20))
-        df_greeks['Instantaneous ' + greek] =\
-            df_greeks['Forward'].apply(lambda u: dict_fonc[greek](u))
+        df_greeks['Forward'] = grid["Forward"]
+        df_greeks['Instantaneous ' + greek] = grid[greek][0]
         df_greeks[greek + ' in {} days with {:.2f}% vol move'.format(
-            shift_time, shift_vol * 100)] =\
-            df_greeks['Forward'].apply(lambda u: dict_fonc[greek](u,
-                                                                  shift_time,
-                                                                  shift_vol))
+            shift_time, shift_vol * 100)] = grid[greek][1]
         df_greeks.dropna(axis=0, how='any', inplace=True)
         self.df_greeks = df_greeks
-        self.cds_greeks.data = {"Forward": df_greeks.iloc[:, 0],
-                                "Instantaneous": df_greeks.iloc[:, 1],
-                                "Future": df_greeks.iloc[:, 2]}
-        self.columns_greeks =\
-            [TableColumn(field="Forward", title="Forward"),
-             TableColumn(field="Instantaneous",
-                         title='Instantaneous ' + greek),
-             TableColumn(field="Future",
-                         title=greek +
-                         ' in {} days with {:.2f}% vol move'.format(
-                             shift_time, shift_vol * 100))]
-        self.greeks_table.source, self.greeks_table.columns =\
-            self.cds_greeks, self.columns_greeks
-
-    def create_figures(self, greek):
-        self.pnl_fig = figure(plot_width=600,
-                              plot_height=400,
-                              x_axis_label='Stock Price',
-                              y_axis_label='P&L Value',
-                              title="P&L",
-                              sizing_mode="scale_both",
-                              background_fill_color="white",
-                              border_fill_color="white")
-        self.pnl_fig.line("Forward", "Instantaneous", source=self.cds_pnl,
-                          line_color='dodgerblue',
-                          legend_label="Instantaneous Value")
-        # self.columns_pnl[1].title)
-        self.pnl_fig.line("Forward", "Future", source=self.cds_pnl,
-                          line_color='red', line_dash='dashed',
-                          legend_label="Projected Value")
-        # self.columns_pnl[-1].title)
-
-        self.greeks_fig = figure(plot_width=600,
-                                 plot_height=400,
-                                 x_axis_label='Stock Price',
-                                 y_axis_label='Value',
-                                 title=greek,
-                                 sizing_mode="scale_both",
-                                 background_fill_color="white",
-                                 border_fill_color="white")
-        self.greeks_fig.line("Forward", "Instantaneous",
-                             source=self.cds_greeks, line_color='dodgerblue',
-                             legend_label="Instantaneous Value")
-        # self.columns_greeks[1].title)
-        self.greeks_fig.line("Forward", "Future",
-                             source=self.cds_greeks, line_color='red',
-                             line_dash='dashed',
-                             legend_label="Projected Value")
-        # self.columns_greeks[-1].title)
+        return df_greeks
 
     def get_df_pnl_greeks(self, greek, step, shift_time,
                           shift_vol, nb_display=40):
-        self.get_df_pnl(step, shift_time, shift_vol, nb_display)
-        self.get_df_greeks(greek, step, shift_time, shift_vol, nb_display)
+        return (self.get_df_pnl(step, shift_time, shift_vol, nb_display),
+                self.get_df_greeks(greek, step, shift_time, shift_vol,
+                                   nb_display))
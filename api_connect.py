@@ -1,15 +1,84 @@
-import yfinance as yf
-from forex_python.converter import CurrencyRates
-import pandas as pd
+import threading
+from datetime import datetime
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from instrumentation import timed
+from market_service import MarketService
+from ticker_universe import get_universe
 
-df_tickers = dict(pd.read_excel("tickers.xlsx", sep=",",  sheet_name=None))
+
+class ChainPrefetch:
+    # loads the calls and puts of several maturities of a ticker with a
+    # bounded thread pool, in the background. progress(done, total) is
+    # called from the worker threads after each maturity.
+
+    def __init__(self, api, ticker, maturities, max_workers=4,
+                 progress=None):
+        self.api = api
+        self.ticker = ticker
+        self.total = len(maturities)
+        self.done = 0
+        self.errors = {}
+        self.progress = progress
+        self.cancelled = False
+        self._lock = threading.Lock()
+        executor = ThreadPoolExecutor(max_workers)
+        self.futures = {m: executor.submit(self._fetch, m)
+                        for m in maturities}
+        executor.shutdown(wait=False)
+
+    def _fetch(self, maturity):
+        try:
+            for option_type in ("Call", "Put"):
+                if self.cancelled:
+                    raise CancelledError()
+                self.api.load_chain(self.ticker, maturity, option_type)
+        except Exception as e:
+            self.errors[maturity] = e
+        with self._lock:
+            self.done += 1
+            done = self.done
+        if self.progress is not None:
+            self.progress(done, self.total)
+
+    def ready(self, maturity):
+        future = self.futures.get(maturity)
+        return future is not None and future.done()\
+            and not future.cancelled() and maturity not in self.errors
+
+    def finished(self):
+        # every maturity loaded, failed or cancelled
+        cancelled = sum(f.cancelled() for f in self.futures.values())
+        return self.done + cancelled == self.total
+
+    def wait(self, timeout=None):
+        for future in list(self.futures.values()):
+            if not future.cancelled():
+                future.result(timeout)
+
+    def cancel(self):
+        # maturities not started yet are dropped, the running ones stop
+        # before their next chain
+        self.cancelled = True
+        for future in self.futures.values():
+            future.cancel()
 
 
 class finance_api:
-    def __init__(self, portfolio_currency):
+    def __init__(self, portfolio_currency, ttl=None, cache_size=256,
+                 fx_interval=3600, rates_file=None, provider=None,
+                 service=None):
         self.portfolio_currency = portfolio_currency
-        self.c_rates = CurrencyRates()
-        self.tickers = df_tickers
+        if service is None:
+            # market data of this finance_api only, from provider (see
+            # providers.py)
+            service = MarketService(provider, ttl, cache_size, fx_interval,
+                                    rates_file)
+        # provider, caches and chains, shared with the other sessions of
+        # the process when service is given (see market_service.py)
+        self.provider = service.provider
+        self.fx = service.fx
+        self.cache = service.cache
+        self.chains = service.chains
         self.col_dict = {'Contract': 'contractSymbol',
                          'Last Trade Date': 'lastTradeDate',
                          'Strike': 'strike',
@@ -31,84 +100,189 @@ class finance_api:
         self.col_names = list(self.col_dict.keys())
 
         self.options_data = dict()
+        # the (maturity, type) last loaded in options_data for each ticker,
+        # self.chains keeping every chain fetched so far
+        self.loaded = dict()
+        self.prefetch = None
+        # (S_0, r, q, today) at which the chains of each ticker are
+        # calibrated, see calibrate_chains
+        self.calibration = dict()
+
+    @property
+    def tickers(self):
+        # the ticker universe is only loaded when first needed
+        return get_universe()
 
+    @timed("finance_api.show_exchanges")
     def show_exchanges(self):
-        return list(self.tickers.keys())
+        return self.tickers.exchanges()
 
+    @timed("finance_api.show_tickers")
     def show_tickers(self, exchange):
-        temp = self.tickers[exchange]
-        return {temp.loc[i, "Name"]: temp.loc[i, "Symbol"] for i in temp.index}
+        return self.tickers.tickers(exchange)
 
+    @timed("finance_api.get_info")
+    def get_info(self, ticker):
+        return self.cache["info"].get_or_fetch(
+            ticker, lambda: self.provider.info(ticker))
+
+    @timed("finance_api.get_currency")
+    def get_currency(self, ticker):
+        return self.get_info(ticker)['currency']
+
+    @timed("finance_api.get_div_yield")
     def get_div_yield(self, ticker):
+        # 0 for the stocks without dividend yield, the yield being used to
+        # price (see calibrate_chains)
         try:
-            out = yf.Ticker(ticker).info['dividendYield']
+            out = self.get_info(ticker)['dividendYield']
         except Exception:
             print("No dividend yield for this stock")
-            return -1
-        return out
+            return 0
+        return 0 if out is None else out
 
+    @timed("finance_api.get_price")
     def get_price(self, ticker, convert_currency=True):
-        stock_info = yf.Ticker(ticker).info
+        stock_info = self.get_info(ticker)
         curr = stock_info['currency']
+        price = self._mid(stock_info)
+        if self.portfolio_currency != curr and convert_currency:
+            return self.fx.convert(curr, self.portfolio_currency, price)
+        else:
+            return price
+
+    @timed("finance_api.get_live_price")
+    def get_live_price(self, ticker):
+        # spot in the source currency from a quote at most
+        # market_service.cache_ttl["quote"] seconds old. The quote is
+        # fetched once for all the sessions sharing the caches, and the
+        # info cache is left as is.
+        return self._mid(self.cache["quote"].get_or_fetch(
+            ticker, lambda: self.provider.info(ticker)))
+
+    @staticmethod
+    def _mid(stock_info):
         bid = stock_info['bid']
         ask = stock_info['ask']
         price = (bid + ask)/2
         if bid == 0 or ask == 0:
             price = stock_info['previousClose']
-        if self.portfolio_currency != curr and convert_currency:
-            return self.c_rates.convert(curr, self.portfolio_currency, price)
-        else:
-            return price
+        return price
 
+    @timed("finance_api.get_maturities")
     def get_maturities(self, ticker):
         try:
-            sol = list(yf.Ticker(ticker).options)
+            sol = list(self.cache["expiries"].get_or_fetch(
+                ticker, lambda: self.provider.expiries(ticker)))
         except Exception:
             print("No option data available on yahoo for this ticker")
             return -1
         return sol
 
+    @timed("finance_api.possible_values")
     def possible_values(self, ticker, attribute):
         if self.options_data == dict():
             print("No option data loaded")
             return -1
+        elif attribute == "Strike" and ticker in self.loaded:
+            return list(self.chains.get(ticker, *self.loaded[ticker])
+                        .unique_strikes)
         else:
             return sorted(list(set(self.options_data[ticker]
                                    [attribute].values)))
 
+    @timed("finance_api.get_options_data")
     def get_options_data(self, ticker, option_type, maturity):
         if maturity not in self.get_maturities(ticker):
             print("Maturity not in maturities list")
             return -1
+        if option_type not in ("Call", "Put"):
+            print("Wrong option type name, \
+                  you can type either \'Call\' or \'Put'")
+            return -1
         try:
-            asset = yf.Ticker(ticker)
+            chain = self.load_chain(ticker, maturity, option_type)
         except Exception as e:
             print("Wrong ticker name")
             return e.__class__
+        self.loaded[ticker] = (maturity, option_type)
+        self.options_data[ticker] = chain.frame
 
-        if option_type == "Call":
-            res = asset.option_chain(maturity).calls.sort_values(
-                'lastTradeDate', ascending=False)
-        elif option_type == "Put":
-            res = asset.option_chain(maturity).puts.sort_values(
-                'lastTradeDate', ascending=False)
-        else:
-            print("Wrong option type name, \
-                  you can type either \'Call\' or \'Put'")
-            return -1
-        res = res[list(self.col_dict_bis.keys())]
-        res.columns = list(map(
-            lambda x: self.col_dict_bis[x], list(res.columns)))
-        self.options_data[ticker] = res
+    @timed("finance_api.load_chain")
+    def load_chain(self, ticker, maturity, option_type):
+        # chain store entry of (ticker, maturity, type), rebuilt only when
+        # the cached yahoo chain was refetched
+        raw = self.get_chain(ticker, maturity, option_type)
+        chain = self.chains.get(ticker, maturity, option_type)
+        if chain is None or chain.source is not raw:
+            res = raw[list(self.col_dict_bis.keys())]
+            res.columns = list(map(
+                lambda x: self.col_dict_bis[x], list(res.columns)))
+            chain = self.chains.put(ticker, maturity, option_type, res, raw)
+            self._calibrated_vols(ticker, maturity, option_type, chain)
+        return chain
 
+    def _calibrated_vols(self, ticker, maturity, option_type, chain):
+        # volatilities of chain at the calibration of ticker, or None
+        if ticker not in self.calibration:
+            return None
+        S_0, r, q, today = self.calibration[ticker]
+        T = (datetime.strptime(maturity, "%Y-%m-%d") - today).days
+        return chain.calibrate(S_0, T, r, q, option_type == "Call")[0]
+
+    @timed("finance_api.calibrate_chains")
+    def calibrate_chains(self, ticker, S_0, r, q=0, today=None):
+        # implied volatilities of the chains of ticker solved from their
+        # prices at spot S_0, instead of the ones of the feed. The chains
+        # loaded later are calibrated at the same spot. The calibration
+        # only applies to this finance_api, the chains shared with other
+        # sessions keeping their feed volatilities.
+        today = today or datetime.today()
+        self.calibration[ticker] = (S_0, r, q, today)
+        self.chains.calibrate(ticker, S_0, r, q, today)
+
+    @timed("finance_api.implied_vol")
+    def implied_vol(self, ticker, maturity, option_type, K):
+        # implied volatility of a listed strike
+        chain = self.load_chain(ticker, maturity, option_type)
+        return chain.implied_vol(K, vols=self._calibrated_vols(
+            ticker, maturity, option_type, chain))
+
+    @timed("finance_api.get_chain")
+    def get_chain(self, ticker, maturity, option_type):
+        # raw yahoo chain of one (ticker, maturity, type). Calls and puts come
+        # in the same request, so the other type is cached as well.
+        def fetch():
+            chain = self.provider.option_chain(ticker, maturity)
+            other = "Put" if option_type == "Call" else "Call"
+            self.cache["chain"].put((ticker, maturity, other),
+                                    chain.puts if other == "Put"
+                                    else chain.calls)
+            return chain.calls if option_type == "Call" else chain.puts
+        return self.cache["chain"].get_or_fetch(
+            (ticker, maturity, option_type), fetch)
+
+    @timed("finance_api.prefetch_chains")
+    def prefetch_chains(self, ticker, max_workers=4, progress=None):
+        # starts loading the chains of every maturity of ticker in the
+        # background. Chains not loaded yet are still fetched on demand by
+        # get_options_data.
+        maturities = self.get_maturities(ticker)
+        self.cancel_prefetch()
+        if maturities != -1:
+            self.prefetch = ChainPrefetch(self, ticker, maturities,
+                                          max_workers, progress)
+        return self.prefetch
+
+    def cancel_prefetch(self):
+        if self.prefetch is not None:
+            self.prefetch.cancel()
+            self.prefetch = None
+
+    @timed("finance_api.filter_options")
     def filter_options(self, ticker, attribute, value):
         if value not in self.possible_values(ticker, attribute):
             print('{} is not a possible {} value'.format(value, attribute))
             return -1
         self.options_data[ticker] = self.options_data[ticker]
         [self.options_data[ticker][attribute] == value]
-
-
-first_api = finance_api('EUR')
-
-# print(first_api.get_price('AAPL'))
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from pricing import PRICE_GREEKS, bs_price_greeks
+
+# columns of the backtest results
+columns = ["Spot", "Value", "P&L", "Delta", "Gamma", "Vega", "Theta",
+           "Delta P&L", "Gamma P&L", "Theta P&L", "Residual", "Legs"]
+
+
+def load_history(source, ticker=None, start=None, end=None):
+    # daily closes of an underlying, as a Series indexed by date, from a
+    # market data provider (see providers.py) or from a local CSV or Parquet
+    # file with a Date column (or index) and a Close column
+    if isinstance(source, str):
+        if source.endswith(".parquet"):
+            frame = pd.read_parquet(source)
+        else:
+            frame = pd.read_csv(source)
+        if "Date" in frame.columns:
+            frame = frame.set_index("Date")
+        closes = frame["Close"]
+        closes.index = pd.to_datetime(closes.index)
+    else:
+        closes = source.history(ticker, start, end)
+    # yahoo dates are in the exchange timezone: kept as naive local dates
+    if getattr(closes.index, "tz", None) is not None:
+        closes = closes.tz_localize(None)
+    closes = closes.sort_index()
+    if start is not None:
+        closes = closes[closes.index >= pd.Timestamp(start)]
+    if end is not None:
+        closes = closes[closes.index <= pd.Timestamp(end)]
+    return closes.astype(float)
+
+
+def iter_backtest(strategy, closes, chunk_size=250):
+    # revaluation of the legs of strategy on each day of closes, the legs
+    # being bought on the first day with their current time to maturity,
+    # which then decays with the calendar days. Implied volatilities and
+    # rate are kept constant. A leg expiring during the window is settled
+    # at its payoff on the first close on or after its expiry.
+    # Yields DataFrames of at most chunk_size days (see columns), so that
+    # only (chunk_size x legs) arrays are in memory.
+    legs = {k: np.array(v) for k, v in strategy.legs().items()}
+    r = strategy.r
+    stocks = strategy.stocks
+    spots = closes.to_numpy(dtype=float)
+    days = np.asarray((closes.index - closes.index[0]).days, dtype=float)
+
+    # settlement value of each leg: payoff at the close of its expiry day
+    expiry = np.searchsorted(days, legs["T"])
+    S_exp = spots[np.minimum(expiry, len(spots) - 1)]
+    settled = np.where(legs["is_call"], np.maximum(S_exp - legs["K"], 0),
+                       np.maximum(legs["K"] - S_exp, 0))
+
+    previous = None
+    for start in range(0, len(spots), chunk_size):
+        S = spots[start:start + chunk_size]
+        d = days[start:start + chunk_size]
+        T = legs["T"] - d[:, None]
+        alive = T > 0
+        res = bs_price_greeks(S[:, None], legs["K"], np.where(alive, T, 1),
+                              legs["sigma"], r, legs["is_call"])
+        out = {"Spot": S}
+        for name in PRICE_GREEKS:
+            values = np.where(alive, res[name],
+                              settled if name == "BSprice" else 0)
+            out[name] = values @ legs["amount"]
+        out["BSprice"] = out["BSprice"] + stocks * S
+        out["Delta"] = out["Delta"] + stocks
+        out["Legs"] = alive.sum(axis=1)
+        frame = pd.DataFrame(out, index=closes.index[start:start + len(S)])
+        frame = frame.rename(columns={"BSprice": "Value"})
+        if previous is None:
+            # the first day is compared to itself
+            previous = frame.iloc[0]
+            previous_day = d[0]
+            first_value = previous["Value"]
+        frame["P&L"] = frame["Value"] - first_value
+
+        # attribution of the daily P&L with the greeks of the day before
+        prev = pd.concat([previous.to_frame().T, frame.iloc[:-1]])
+        dS = S - prev["Spot"].to_numpy()
+        dt = d - np.append(previous_day, d[:-1])
+        daily = frame["Value"].to_numpy() - prev["Value"].to_numpy()
+        frame["Delta P&L"] = prev["Delta"].to_numpy() * dS
+        frame["Gamma P&L"] = 0.5 * prev["Gamma"].to_numpy() * dS**2
+        frame["Theta P&L"] = prev["Theta"].to_numpy() * dt
+        frame["Residual"] = daily - frame["Delta P&L"]\
+            - frame["Gamma P&L"] - frame["Theta P&L"]
+        previous = frame.iloc[-1]
+        previous_day = d[-1]
+        yield frame[columns]
+
+
+def backtest(strategy, closes, chunk_size=250):
+    # whole backtest as one DataFrame, see iter_backtest
+    return pd.concat(list(iter_backtest(strategy, closes, chunk_size)))
@@ -0,0 +1,123 @@
+"""
+Batch pricing of strategies, without any UI toolkit.
+
+    python batch.py strategies.jsonl --format csv --output results.csv
+    python batch.py strategies.json --snapshot market/ --shift-time 5
+
+Each strategy is a JSON object, in a JSON list (.json) or one per line
+(.jsonl):
+
+    {"name": "AAPL spread", "ticker": "AAPL", "currency": "EUR",
+     "stocks": 0, "r": 0.01,
+     "legs": [{"K": 130, "T": 30, "sigma": 0.25, "option_type": "Call",
+               "amount": 1, "maturity_date": "2021-04-16"}]}
+
+"S_0" can be given to price at another spot than the market one. Market
+data comes from yahoo, or from a snapshot directory (see providers.py), and
+is shared by all the strategies. A line of results (CSV or JSON) is written
+as soon as each strategy is priced. --metrics writes the timings of the
+market data calls and pricing stages to a JSON file (see
+instrumentation.py).
+"""
+import argparse
+import csv
+import json
+import sys
+from instrumentation import metrics
+from market_service import MarketService
+from OptionClass import Strategy
+from pricing import PRICE_GREEKS
+from providers import load_snapshot
+
+fields = ["name", "ticker", "currency", "S_0", "r", "legs"]\
+    + list(PRICE_GREEKS) + ["price_shifted", "error"]
+
+
+def read_definitions(path):
+    # strategy definitions, read one at a time for .jsonl files
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+def price_definition(definition, service, shift_time=0, shift_vol=0):
+    strategy = Strategy(definition.get("ticker", "AAPL"),
+                        definition.get("currency", "EUR"),
+                        definition.get("stocks", 0), service=service)
+    strategy.r = definition.get("r", 0)
+    if "S_0" in definition:
+        strategy.S_0 = definition["S_0"]
+    for leg in definition.get("legs", []):
+        strategy.add_option(leg["K"], leg["T"], leg["sigma"],
+                            leg["option_type"], leg["amount"],
+                            leg.get("maturity_date"))
+    out = {"name": definition.get("name"), "ticker": strategy.ticker,
+           "currency": strategy.source_currency, "S_0": strategy.S_0,
+           "r": strategy.r, "legs": len(strategy.positions)}
+    out.update(strategy.aggregates())
+    out["price_shifted"] = strategy.price(0, shift_time, shift_vol)\
+        if shift_time or shift_vol else out["BSprice"]
+    return out
+
+
+def run(definitions, service, out, fmt="csv", shift_time=0, shift_vol=0):
+    # prices the definitions and writes a line per strategy to out.
+    # Returns the number of strategies that failed.
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+    failed = 0
+    for definition in definitions:
+        try:
+            row = price_definition(definition, service, shift_time,
+                                   shift_vol)
+        except Exception as e:
+            failed += 1
+            row = {"name": definition.get("name"),
+                   "ticker": definition.get("ticker"),
+                   "error": "{}: {}".format(type(e).__name__, e)}
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row) + "\n")
+        out.flush()
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("definitions", help=".json or .jsonl strategy file")
+    parser.add_argument("--output", help="result file (default: stdout)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--snapshot", help="market data snapshot directory")
+    parser.add_argument("--shift-time", type=float, default=0,
+                        help="days for the shifted price")
+    parser.add_argument("--shift-vol", type=float, default=0,
+                        help="volatility shift for the shifted price")
+    parser.add_argument("--metrics", help="JSON file of the timings")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+
+    service = MarketService(load_snapshot(args.snapshot)
+                            if args.snapshot else None)
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        failed = run(read_definitions(args.definitions), service, out,
+                     args.format, args.shift_time, args.shift_vol)
+    finally:
+        if args.output:
+            out.close()
+        if args.metrics:
+            with open(args.metrics, "w") as f:
+                f.write(metrics.to_json())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Benchmarks of the pricing and refresh hot paths.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output new.json --compare bench.json --threshold 0.25
+
+Market data comes from an in-memory snapshot, so no connection is needed.
+With --compare, the run fails (exit code 1) when a benchmark is slower than
+in the reference file by more than the threshold (0.25 = 25%).
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from fixtures import make_strategy
+from OptionClass import Option
+
+
+def timed(fonc, min_time=0.2, max_repeat=1000):
+    # best time of one call, over as many calls as fit in min_time
+    best = float("inf")
+    start = time.perf_counter()
+    for i in range(max_repeat):
+        t = time.perf_counter()
+        fonc(i)
+        best = min(best, time.perf_counter() - t)
+        if time.perf_counter() - start > min_time:
+            break
+    return best
+
+
+def benchmarks(leg_counts=(1, 10, 100, 1000), grid_sizes=(40, 200)):
+    # {name: function(i)}, i being the index of the call
+    out = {"Option construction":
+           lambda i: Option(130, 100 + i % 60, 30, 0.2, 0.002, 0).BSprice}
+    s = make_strategy(10)
+    for name in ("price", "Delta", "Gamma", "Vega", "Theta"):
+        fonc = getattr(s, name)
+        out["Strategy.{} 10 legs".format(name)] = lambda i, f=fonc: f()
+        out["Strategy.{} 10 legs shifted".format(name)] =\
+            lambda i, f=fonc: f(125 + i % 10, 5, 0.01)
+    for n_legs in leg_counts:
+        s = make_strategy(n_legs)
+        for nb_display in grid_sizes:
+            # a different vol shift at each call, so the grid is recomputed
+            out["get_df_pnl_greeks {} legs {} points".format(
+                n_legs, nb_display)] =\
+                lambda i, s=s, n=nb_display: s.get_df_pnl_greeks(
+                    "Delta", 0.005, 5, (i % 100) / 1000, n)
+        out["get_df_options {} legs".format(n_legs)] =\
+            lambda i, s=s: s.get_df_options()
+    s = make_strategy(100)
+    s.get_df_pnl_greeks("Delta", 0.005, 5, 0.01)
+    out["get_df_pnl_greeks 100 legs greek switch"] =\
+        lambda i, s=s: s.get_df_pnl_greeks(["Delta", "Gamma"][i % 2], 0.005,
+                                           5, 0.01)
+    return out
+
+
+def run(min_time=0.2, **kwargs):
+    results = {name: timed(fonc, min_time)
+               for name, fonc in benchmarks(**kwargs).items()}
+    return {"meta": {"python": platform.python_version(),
+                     "machine": platform.machine(),
+                     "time": time.strftime("%Y-%m-%d %H:%M:%S")},
+            "results": results}
+
+
+def compare(reference, current, threshold=0.25):
+    # {name: slowdown ratio} of the benchmarks slower than the threshold
+    out = {}
+    for name, t in current["results"].items():
+        ref = reference["results"].get(name)
+        if ref and t / ref > 1 + threshold:
+            out[name] = t / ref
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--output", help="JSON file to save the results")
+    parser.add_argument("--compare", help="JSON file of reference results")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="time spent on each benchmark, in seconds")
+    args = parser.parse_args(argv)
+
+    res = run(args.min_time)
+    for name, t in res["results"].items():
+        print("{:<50} {:>12.1f} us".format(name, t * 1e6))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(res, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(json.load(f), res, args.threshold)
+        for name, ratio in slower.items():
+            print("SLOWER: {} x{:.2f}".format(name, ratio))
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
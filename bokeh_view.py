@@ -0,0 +1,107 @@
+from bokeh.models import ColumnDataSource
+from bokeh.models.widgets import DataTable, TableColumn
+from bokeh.plotting import figure
+from cds_sync import sync_columns, sync_source
+from instrumentation import span, timed
+
+
+class StrategyView:
+    # Bokeh tables and figures of a Strategy. The data frames are computed
+    # by the Strategy; the view only sends them to its ColumnDataSources
+    # (timed as the StrategyView.sync span).
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.cds_options = ColumnDataSource()
+        self.cds_pnl = ColumnDataSource()
+        self.cds_greeks = ColumnDataSource()
+
+        self.columns_options = [TableColumn(field="Amount", title="Amount"),
+                                TableColumn(field="Option type",
+                                            title='Option type'),
+                                TableColumn(field="Maturity date",
+                                            title="Maturity"),
+                                TableColumn(field="Maturity",
+                                            title="Days to maturity"),
+                                TableColumn(field="Strike",
+                                            title="Strike"),
+                                TableColumn(field="Implied volatility",
+                                            title="Implied volatility (in %)"),
+                                TableColumn(field="Value", title="Value")]
+        self.columns_pnl = []
+        self.columns_greeks = []
+
+        self.options_table = DataTable(columns=self.columns_options,
+                                       source=self.cds_options)
+        self.pnl_table = DataTable(columns=self.columns_pnl,
+                                   source=self.cds_pnl)
+        self.greeks_table = DataTable(columns=self.columns_greeks,
+                                      source=self.cds_greeks)
+
+        self.pnl_fig = figure()
+        self.greeks_fig = figure()
+
+    def get_df_options(self):
+        df = self.strategy.get_df_options()
+        with span("StrategyView.sync"):
+            sync_source(self.cds_options,
+                        {col.field: df[col.field].to_numpy()
+                         for col in self.columns_options})
+
+    @timed("StrategyView.sync")
+    def _sync_grid(self, source, table, df):
+        # the three columns of a P&L or greek frame, titled by its columns
+        sync_source(source, {"Forward": df.iloc[:, 0].to_numpy(),
+                             "Instantaneous": df.iloc[:, 1].to_numpy(),
+                             "Future": df.iloc[:, 2].to_numpy()})
+        columns = [TableColumn(field=field, title=title) for field, title
+                   in zip(("Forward", "Instantaneous", "Future"), df.columns)]
+        sync_columns(table, columns)
+        return columns
+
+    def get_df_pnl(self, step, shift_time, shift_vol, nb_display=40):
+        df = self.strategy.get_df_pnl(step, shift_time, shift_vol, nb_display)
+        self.columns_pnl = self._sync_grid(self.cds_pnl, self.pnl_table, df)
+
+    def get_df_greeks(self, greek, step, shift_time, shift_vol, nb_display=40):
+        df = self.strategy.get_df_greeks(greek, step, shift_time, shift_vol,
+                                         nb_display)
+        self.columns_greeks = self._sync_grid(self.cds_greeks,
+                                              self.greeks_table, df)
+
+    def get_df_pnl_greeks(self, greek, step, shift_time,
+                          shift_vol, nb_display=40):
+        self.get_df_pnl(step, shift_time, shift_vol, nb_display)
+        self.get_df_greeks(greek, step, shift_time, shift_vol, nb_display)
+
+    def create_figures(self, greek):
+        self.pnl_fig = figure(plot_width=600,
+                              plot_height=400,
+                              x_axis_label='Stock Price',
+                              y_axis_label='P&L Value',
+                              title="P&L",
+                              sizing_mode="scale_both",
+                              background_fill_color="white",
+                              border_fill_color="white")
+        self.pnl_fig.line("Forward", "Instantaneous", source=self.cds_pnl,
+                          line_color='dodgerblue',
+                          legend_label="Instantaneous Value")
+        self.pnl_fig.line("Forward", "Future", source=self.cds_pnl,
+                          line_color='red', line_dash='dashed',
+                          legend_label="Projected Value")
+
+        self.greeks_fig = figure(plot_width=600,
+                                 plot_height=400,
+                                 x_axis_label='Stock Price',
+                                 y_axis_label='Value',
+                                 title=greek,
+                                 sizing_mode="scale_both",
+                                 background_fill_color="white",
+                                 border_fill_color="white")
+        self.greeks_fig.line("Forward", "Instantaneous",
+                             source=self.cds_greeks, line_color='dodgerblue',
+                             legend_label="Instantaneous Value")
+        self.greeks_fig.line("Forward", "Future",
+                             source=self.cds_greeks, line_color='red',
+                             line_dash='dashed',
+                             legend_label="Projected Value")
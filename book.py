@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from OptionClass import leg_label
+from pricing import PRICE_GREEKS, bs_price_greeks
+
+
+class Book:
+    # strategies on many underlyings and currencies, with running aggregates
+    # (value and greeks). The contribution of each strategy is kept in its
+    # own currency and only updated for what changed: the legs added or
+    # removed through the book, or the strategies of an underlying whose
+    # spot moved. A strategy changed outside of the book is recomputed on
+    # the next read.
+    # Book totals are converted to the book currency with the FX cache of
+    # the strategies' finance_api at read time, Delta and Gamma being given
+    # in cash (Delta * S_0, and Gamma * S_0^2 / 100 for a 1% move).
+
+    def __init__(self, currency="EUR"):
+        self.currency = currency
+        self.strategies = {}
+        # name -> (state of the strategy, contribution as an array in the
+        # order of PRICE_GREEKS)
+        self._contrib = {}
+        # ticker -> {name of strategy: None}
+        self._by_ticker = {}
+
+    def _state(self, strategy):
+        return (strategy.positions.version, strategy.S_0, strategy.r,
+                strategy.stocks)
+
+    def _sync(self, name):
+        # full recomputation of one strategy's contribution
+        strategy = self.strategies[name]
+        agg = strategy.aggregates()
+        self._contrib[name] = (self._state(strategy),
+                               np.array([agg[k] for k in PRICE_GREEKS]))
+
+    def _fresh(self, name):
+        state, contrib = self._contrib[name]
+        if state != self._state(self.strategies[name]):
+            self._sync(name)
+        return self._contrib[name][1]
+
+    def add_strategy(self, strategy, name=None):
+        if name is None:
+            name = strategy.ticker
+            i = 1
+            while name in self.strategies:
+                i += 1
+                name = "{} {}".format(strategy.ticker, i)
+        self.strategies[name] = strategy
+        self._by_ticker.setdefault(strategy.ticker, {})[name] = None
+        self._sync(name)
+        return name
+
+    def remove_strategy(self, name):
+        strategy = self.strategies.pop(name)
+        del self._contrib[name]
+        names = self._by_ticker[strategy.ticker]
+        del names[name]
+        if not names:
+            del self._by_ticker[strategy.ticker]
+
+    def add_option(self, name, K, T, sigma, option_type, amount,
+                   maturity_date=None):
+        # adds a leg to a strategy of the book (a negative amount removes
+        # it), only the new leg being priced. An existing leg keeps its
+        # stored volatility, at which the change is priced.
+        strategy = self.strategies[name]
+        state, contrib = self._contrib[name]
+        up_to_date = state == self._state(strategy)
+        label = leg_label(option_type, K, T)
+        if label in strategy.positions:
+            sigma = float(strategy.positions.row(label)["sigma"])
+        strategy.add_option(K, T, sigma, option_type, amount, maturity_date)
+        if not up_to_date:
+            self._sync(name)
+            return
+        leg = bs_price_greeks(strategy.S_0, K, T, sigma, strategy.r,
+                              option_type == "Call")
+        contrib = contrib + amount * np.array([float(leg[k])
+                                               for k in PRICE_GREEKS])
+        self._contrib[name] = (self._state(strategy), contrib)
+
+    def set_stock_quantity(self, name, n_stocks):
+        strategy = self.strategies[name]
+        state, contrib = self._contrib[name]
+        up_to_date = state == self._state(strategy)
+        change = n_stocks - strategy.stocks
+        strategy.set_stock_quantity(n_stocks)
+        if not up_to_date:
+            self._sync(name)
+            return
+        contrib = contrib.copy()
+        contrib[0] += change * strategy.S_0
+        contrib[1] += change
+        self._contrib[name] = (self._state(strategy), contrib)
+
+    def update_spot(self, ticker, S_0):
+        # reprices the strategies of one underlying
+        for name in self._by_ticker.get(ticker, ()):
+            self.strategies[name].update_spot(S_0)
+            self._sync(name)
+
+    @property
+    def tickers(self):
+        return list(self._by_ticker)
+
+    def underlying(self, ticker):
+        # aggregates of one underlying, in its own currency
+        total = sum(self._fresh(name) for name in self._by_ticker[ticker])
+        return dict(zip(PRICE_GREEKS, map(float, total)))
+
+    def _converted(self, ticker):
+        # aggregates of one underlying in the book currency, greeks in cash
+        strategy = self.strategies[next(iter(self._by_ticker[ticker]))]
+        agg = self.underlying(ticker)
+        rate = strategy.api.fx.rate(strategy.source_currency, self.currency)
+        S_0 = strategy.S_0
+        return {"BSprice": agg["BSprice"] * rate,
+                "Delta": agg["Delta"] * S_0 * rate,
+                "Gamma": agg["Gamma"] * S_0**2 / 100 * rate,
+                "Vega": agg["Vega"] * rate,
+                "Theta": agg["Theta"] * rate}
+
+    def totals(self):
+        # aggregates of the whole book, in the book currency
+        out = dict.fromkeys(PRICE_GREEKS, 0.)
+        for ticker in self._by_ticker:
+            for k, v in self._converted(ticker).items():
+                out[k] += v
+        return out
+
+    def report(self):
+        # one row per underlying, in the book currency
+        rows = {ticker: self._converted(ticker) for ticker in self._by_ticker}
+        return pd.DataFrame.from_dict(rows, orient="index",
+                                      columns=list(PRICE_GREEKS))
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+def _changed_rows(old, new):
+    # slice of the rows that differ between two columns of the same length,
+    # or None when they are equal (nan equal to nan)
+    old = np.asarray(old)
+    new = np.asarray(new)
+    if old.dtype.kind == "f" and new.dtype.kind == "f":
+        diff = ~((old == new) | (np.isnan(old) & np.isnan(new)))
+    else:
+        diff = np.array([a != b for a, b in zip(old, new)], dtype=bool)
+    rows = np.flatnonzero(diff)
+    if len(rows) == 0:
+        return None
+    return slice(int(rows[0]), int(rows[-1]) + 1)
+
+
+def sync_source(source, data):
+    # updates a ColumnDataSource to data ({column: numpy array}) by sending
+    # the client a single message: a patch of the changed rows of each
+    # column, or a stream of the new rows when rows were only appended.
+    # The data is replaced in any other case.
+    # Returns "replace", "patch", "stream" or None when nothing changed.
+    data = {k: np.array(v) for k, v in data.items()}
+    old = source.data
+    old_lengths = {len(v) for v in old.values()}
+    lengths = {len(v) for v in data.values()}
+    if set(old) != set(data) or len(lengths) > 1 or len(old_lengths) > 1:
+        source.data = data
+        return "replace"
+    n_old, n = old_lengths.pop(), lengths.pop()
+    if n > n_old and all(_changed_rows(old[k], v[:n_old]) is None
+                         for k, v in data.items()):
+        source.stream({k: v[n_old:] for k, v in data.items()})
+        return "stream"
+    if n != n_old:
+        source.data = data
+        return "replace"
+    patches = {}
+    for k, v in data.items():
+        rows = _changed_rows(old[k], v)
+        if rows is not None:
+            patches[k] = [(rows, v[rows])]
+    if not patches:
+        return None
+    source.patch(patches)
+    return "patch"
+
+
+def sync_columns(table, columns):
+    # sets the columns of a DataTable, only renaming the titles when the
+    # fields did not change, and doing nothing when the titles did not
+    # change either
+    old = table.columns
+    if [c.field for c in old] != [c.field for c in columns]:
+        table.columns = columns
+        return old != columns
+    changed = False
+    for c_old, c_new in zip(old, columns):
+        if c_old.title != c_new.title:
+            c_old.title = c_new.title
+            changed = True
+    return changed
@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from pricing import implied_vol
+
+
+class OptionChain:
+    # one (ticker, maturity, type) chain, sorted by strike, with its main
+    # columns as numpy arrays. Chains are shared by the sessions of a
+    # server (see market_service.py): calibrations never change the feed
+    # volatilities, each one is kept apart under its inputs.
+    max_calibrations = 16
+
+    def __init__(self, frame, source=None):
+        self.frame = frame.sort_values("Strike", kind="mergesort")\
+            .reset_index(drop=True)
+        self.source = source
+        self.strikes = self.frame["Strike"].to_numpy(dtype=float)
+        self.implied_vols = self.frame["Implied Volatility"].to_numpy(
+            dtype=float)
+        self.last_prices = self.frame["Last Price"].to_numpy(dtype=float)
+        self.unique_strikes = np.unique(self.strikes)
+        # bid/ask of the raw yahoo chain, in the same order
+        self.mids = None
+        if source is not None and {"bid", "ask"} <= set(source.columns):
+            rows = source.loc[frame.sort_values(
+                "Strike", kind="mergesort").index]
+            bid = rows["bid"].to_numpy(dtype=float)
+            ask = rows["ask"].to_numpy(dtype=float)
+            self.mids = np.where((bid > 0) & (ask > 0), 0.5 * (bid + ask),
+                                 np.nan)
+        self.feed_vols = self.implied_vols
+        # (vols, converged) of the last calibrations, by their inputs
+        self.calibrations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.strikes)
+
+    def nearest(self, K):
+        # row of the listed strike closest to K
+        i = np.searchsorted(self.strikes, K)
+        if i == len(self.strikes) or (i > 0 and K - self.strikes[i - 1]
+                                      <= self.strikes[i] - K):
+            i -= 1
+        return int(i)
+
+    def find(self, K):
+        # row of strike K, or -1 when it is not listed
+        i = int(np.searchsorted(self.strikes, K))
+        if i < len(self.strikes) and self.strikes[i] == K:
+            return i
+        return -1
+
+    def calibrate(self, S_0, T, r, q=0, is_call=True, use_mid=True):
+        # (vols, converged): implied volatilities solved from the mid (or
+        # the last price when there is no quote) at spot S_0, T in days, and
+        # mask of the rows that converged. The feed volatility is kept for
+        # the others.
+        key = (S_0, T, r, q, is_call, use_mid)
+        with self._lock:
+            if key in self.calibrations:
+                self.calibrations.move_to_end(key)
+                return self.calibrations[key]
+        prices = self.last_prices
+        if use_mid and self.mids is not None:
+            prices = np.where(np.isnan(self.mids), prices, self.mids)
+        vols, converged = implied_vol(prices, S_0, self.strikes, T, r,
+                                      is_call, q)
+        out = (np.where(converged, vols, self.feed_vols), converged)
+        with self._lock:
+            self.calibrations[key] = out
+            while len(self.calibrations) > self.max_calibrations:
+                self.calibrations.popitem(last=False)
+        return out
+
+    def implied_vol(self, K, nearest=False, vols=None):
+        # volatility of the feed, or of vols (see calibrate), at strike K
+        i = self.nearest(K) if nearest else self.find(K)
+        vols = self.implied_vols if vols is None else vols
+        return None if i == -1 else vols[i]
+
+    def last_price(self, K, nearest=False):
+        i = self.nearest(K) if nearest else self.find(K)
+        return None if i == -1 else self.last_prices[i]
+
+
+class ChainStore:
+    # chains of every (ticker, maturity, type) fetched so far. Chains are
+    # put by the prefetch threads while others are read, so the ones
+    # iterated over are a copy taken under the lock. The chains of a
+    # ticker cleared by clear(ticker) are not kept until reopen(ticker).
+
+    def __init__(self):
+        self.chains = {}
+        self.released = set()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.chains
+
+    def __len__(self):
+        return len(self.chains)
+
+    def put(self, ticker, maturity, option_type, frame, source=None):
+        chain = OptionChain(frame, source)
+        with self._lock:
+            if ticker not in self.released:
+                self.chains[(ticker, maturity, option_type)] = chain
+        return chain
+
+    def reopen(self, ticker):
+        with self._lock:
+            self.released.discard(ticker)
+
+    def get(self, ticker, maturity, option_type):
+        return self.chains.get((ticker, maturity, option_type))
+
+    def items(self, ticker=None):
+        # [((ticker, maturity, type), chain)] of ticker, or of all tickers
+        with self._lock:
+            return [(k, v) for k, v in self.chains.items()
+                    if ticker is None or k[0] == ticker]
+
+    def maturities(self, ticker, option_type):
+        return sorted(m for (t, m, o), chain in self.items(ticker)
+                      if o == option_type)
+
+    def implied_vol(self, ticker, maturity, option_type, K, nearest=False):
+        chain = self.get(ticker, maturity, option_type)
+        return None if chain is None else chain.implied_vol(K, nearest)
+
+    def calibrate(self, ticker, S_0, r, q=0, today=None, use_mid=True):
+        # calibrates every chain of ticker at spot S_0, see
+        # OptionChain.calibrate. Returns {(maturity, type): (vols,
+        # converged)}.
+        today = today or datetime.today()
+        out = {}
+        for (t, maturity, option_type), chain in self.items(ticker):
+            T = (datetime.strptime(maturity, "%Y-%m-%d") - today).days
+            out[(maturity, option_type)] = chain.calibrate(
+                S_0, T, r, q, option_type == "Call", use_mid)
+        return out
+
+    def clear(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self.chains = {}
+                self.released = set()
+            else:
+                self.chains = {k: v for k, v in self.chains.items()
+                               if k[0] != ticker}
+                self.released.add(ticker)
@@ -0,0 +1,19 @@
+from OptionClass import Strategy
+from providers import SnapshotProvider
+
+# offline market data and strategies shared by the tests and the benchmarks
+
+stub_market = {"info": {"AAPL": {"currency": "USD", "bid": 130, "ask": 130,
+                                 "previousClose": 130,
+                                 "dividendYield": 0.0063}},
+               "fx": {("USD", "EUR"): 0.82}}
+
+
+def make_strategy(n_legs):
+    strategy = Strategy(provider=SnapshotProvider(stub_market))
+    strategy.r = 0.002
+    for i in range(n_legs):
+        strategy.add_option(100 + (i % 60), 30 + 7 * (i // 60),
+                            0.2 + 0.001 * (i % 50),
+                            "Call" if i % 2 else "Put", 10 - (i % 21))
+    return strategy
@@ -0,0 +1,59 @@
+import json
+import time
+import numpy as np
+from market_cache import TTLCache
+
+
+_c_rates = None
+
+
+def forex_rate(source, target):
+    # live rate from forex_python
+    global _c_rates
+    if _c_rates is None:
+        from forex_python.converter import CurrencyRates
+        _c_rates = CurrencyRates()
+    return float(_c_rates.get_rate(source, target))
+
+
+def load_rates_file(path):
+    # local rates, e.g. {"USD/EUR": 0.92, "GBP/EUR": 1.17}, used instead of
+    # forex_python for offline and benchmark runs
+    with open(path) as f:
+        return {tuple(pair.split("/")): float(rate)
+                for pair, rate in json.load(f).items()}
+
+
+class FXCache:
+    # currency conversion where the rate of each pair is fetched at most
+    # once per interval (in seconds), then applied as a plain multiply, so
+    # that whole arrays are converted with a single lookup
+
+    def __init__(self, interval=3600, rates_file=None, clock=time.monotonic,
+                 source=forex_rate):
+        self.rates = TTLCache(interval, clock=clock, name="cache.fx")
+        self.local_rates = None if rates_file is None\
+            else load_rates_file(rates_file)
+        self.source = source
+
+    def _fetch(self, source, target):
+        if self.local_rates is not None:
+            if (source, target) in self.local_rates:
+                return self.local_rates[(source, target)]
+            if (target, source) in self.local_rates:
+                return 1 / self.local_rates[(target, source)]
+            raise KeyError("No local rate for {}/{}".format(source, target))
+        return self.source(source, target)
+
+    def rate(self, source, target):
+        if source == target:
+            return 1.0
+        return self.rates.get_or_fetch((source, target),
+                                       lambda: self._fetch(source, target))
+
+    def convert(self, source, target, amount):
+        # amount can be a number, a numpy array or a pandas object
+        rate = self.rate(source, target)
+        if isinstance(amount, (list, tuple)):
+            amount = np.asarray(amount, dtype=float)
+        return amount * rate
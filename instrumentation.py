@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Timing spans and counters of the hot paths (market data calls, Strategy
+# stages, server callbacks). Nothing is recorded unless metrics.enabled is
+# set (OPC_METRICS=1 or metrics.enable()); when disabled, timed functions
+# and counters only cost a test of that flag.
+quantiles = (0.5, 0.9, 0.99)
+
+
+class Metrics:
+    # durations (in seconds) of the last window calls of each span, with
+    # the number and total time of all the calls, and counters
+
+    def __init__(self, window=1000, enabled=False):
+        self.window = window
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = [0, 0., deque(maxlen=self.window)]
+            span[0] += 1
+            span[1] += seconds
+            span[2].append(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        # {span: {count, total, mean, p50, p90, p99, max}}, the percentiles
+        # and max being over the rolling window
+        with self._lock:
+            spans = {name: (n, total, np.array(window))
+                     for name, (n, total, window) in self.spans.items()}
+        out = {}
+        for name, (n, total, window) in sorted(spans.items()):
+            stats = {"count": n, "total": total, "mean": total / n}
+            for q, value in zip(quantiles, np.quantile(window, quantiles)):
+                stats["p{:g}".format(q * 100)] = float(value)
+            stats["max"] = float(window.max())
+            out[name] = stats
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(sorted(self.counters.items()))
+        return {"spans": self.summary(), "counters": counters}
+
+    def to_json(self):
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self, prefix="opc"):
+        # text exposition format: a summary per span and a counter each
+        snap = self.snapshot()
+        lines = ["# TYPE {}_span_seconds summary".format(prefix)]
+        for name, stats in snap["spans"].items():
+            for q in quantiles:
+                lines.append('{}_span_seconds{{span="{}",quantile="{:g}"}} '
+                             '{!r}'.format(prefix, name, q,
+                                           stats["p{:g}".format(q * 100)]))
+            lines.append('{}_span_seconds_sum{{span="{}"}} {!r}'.format(
+                prefix, name, stats["total"]))
+            lines.append('{}_span_seconds_count{{span="{}"}} {}'.format(
+                prefix, name, stats["count"]))
+        lines.append("# TYPE {}_events_total counter".format(prefix))
+        for name, n in snap["counters"].items():
+            lines.append('{}_events_total{{name="{}"}} {}'.format(
+                prefix, name, n))
+        return "\n".join(lines) + "\n"
+
+    def html(self):
+        # table of the spans (times in milliseconds) and counters, for a
+        # Bokeh Div
+        snap = self.snapshot()
+        rows = "".join(
+            "<tr><td>{}</td><td>{}</td>{}</tr>".format(
+                name, stats["count"], "".join(
+                    "<td>{:.2f}</td>".format(stats[k] * 1000)
+                    for k in ("mean", "p50", "p90", "p99", "max")))
+            for name, stats in snap["spans"].items())
+        counters = "".join("<tr><td>{}</td><td>{}</td></tr>".format(name, n)
+                           for name, n in snap["counters"].items())
+        return "<table><tr><th>Span</th><th>Calls</th><th>Mean (ms)</th>"\
+            "<th>p50</th><th>p90</th><th>p99</th><th>Max</th></tr>{}"\
+            "</table><table><tr><th>Counter</th><th>Count</th></tr>{}"\
+            "</table>".format(rows, counters)
+
+
+metrics = Metrics(enabled=os.environ.get("OPC_METRICS", "") not in ("", "0"))
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics.record(self.name, time.perf_counter() - self.start)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_no_span = _NoSpan()
+
+
+def span(name):
+    # with span("stage"): ... times the block when the metrics are enabled
+    return _Span(name) if metrics.enabled else _no_span
+
+
+def timed(name):
+    # decorator timing every call of a function as the span name
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return f(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                metrics.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, kind = metrics.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, kind = metrics.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def serve(port=9108, host="127.0.0.1"):
+    # /metrics (Prometheus text) and /metrics.json over HTTP, from a daemon
+    # thread. A single server is started per port and process.
+    with _servers_lock:
+        if port not in _servers:
+            server = ThreadingHTTPServer((host, port), _Handler)
+            threading.Thread(target=server.serve_forever,
+                             daemon=True).start()
+            _servers[port] = server
+        return _servers[port]
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from instrumentation import metrics
+
+
+class TTLCache:
+    # LRU cache whose entries expire ttl seconds after they were fetched.
+    # Concurrent get_or_fetch calls for the same missing key share a single
+    # fetch: the first caller runs it, the others wait for its result.
+    # Hits and misses are also counted in the metrics, under name.
+
+    def __init__(self, ttl, maxsize=256, clock=time.monotonic, name="cache"):
+        self.ttl = ttl
+        self.name = name
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key):
+        # called with the lock held
+        if key in self._data:
+            expiry, value = self._data[key]
+            if expiry > self.clock():
+                self._data.move_to_end(key)
+                return True, value
+            del self._data[key]
+        return False, None
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key)
+        return value if found else default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def get_or_fetch(self, key, fetch):
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                if metrics.enabled:
+                    metrics.count(self.name + ".hits")
+                return value
+            self.misses += 1
+            if metrics.enabled:
+                metrics.count(self.name + ".misses")
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = [threading.Event(), None, None]
+        if not leader:
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return flight[1]
+        try:
+            flight[1] = fetch()
+            self.put(key, flight[1])
+            return flight[1]
+        except Exception as e:
+            # errors are passed to the waiting callers but never cached
+            flight[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight[0].set()
@@ -0,0 +1,72 @@
+import os
+import threading
+from chain_store import ChainStore
+from fx_rates import FXCache
+from market_cache import TTLCache
+from providers import YahooProvider, load_snapshot
+from ticker_universe import get_universe
+
+# time to live (in seconds) of each kind of cached market data, "quote"
+# being the info polled for live spots
+cache_ttl = {"info": 60, "expiries": 3600, "chain": 300, "quote": 1}
+
+
+class MarketService:
+    # market data shared by all the sessions of a server process: quotes,
+    # expiries, chains, FX rates and the ticker universe. Sessions only keep
+    # their own positions and subscribe to the tickers they show; the data
+    # of a ticker is dropped when its last subscriber leaves.
+
+    def __init__(self, provider=None, ttl=None, cache_size=1024,
+                 fx_interval=3600, rates_file=None):
+        self.provider = provider if provider is not None else YahooProvider()
+        self.fx = FXCache(fx_interval, rates_file,
+                          source=self.provider.fx_rate)
+        ttl = dict(cache_ttl, **(ttl or {}))
+        self.cache = {kind: TTLCache(ttl[kind], cache_size,
+                                     name="cache." + kind)
+                      for kind in ttl}
+        self.chains = ChainStore()
+        self.subscribers = {}
+        self._lock = threading.Lock()
+
+    @property
+    def tickers(self):
+        return get_universe()
+
+    def subscribe(self, ticker):
+        with self._lock:
+            self.subscribers[ticker] = self.subscribers.get(ticker, 0) + 1
+            self.chains.reopen(ticker)
+
+    def release(self, ticker):
+        with self._lock:
+            n = self.subscribers.get(ticker, 0) - 1
+            if n > 0:
+                self.subscribers[ticker] = n
+                return
+            self.subscribers.pop(ticker, None)
+            # chains loaded afterwards for ticker are not kept (see
+            # ChainStore.clear) until it is subscribed again
+            self.cache["info"].invalidate(ticker)
+            self.cache["quote"].invalidate(ticker)
+            self.cache["expiries"].invalidate(ticker)
+            for key, chain in self.chains.items(ticker):
+                self.cache["chain"].invalidate(key)
+            self.chains.clear(ticker)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    # the service of the process, created on first use. OPC_SNAPSHOT=<dir>
+    # makes it replay a recorded snapshot instead of live data.
+    global _service
+    with _service_lock:
+        if _service is None:
+            path = os.environ.get("OPC_SNAPSHOT")
+            _service = MarketService(load_snapshot(path) if path else None)
+        return _service
+
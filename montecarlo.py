@@ -0,0 +1,123 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pricing import bs_price_greeks
+
+# sums accumulated over the simulated samples, for each priced column
+_sum_names = ("y", "yy", "x", "xx", "xy")
+
+
+def asian_payoff(paths, K, is_call):
+    # arithmetic average price option, an example of path-dependent payoff.
+    # paths has the shape (paths, steps, legs)
+    average = paths.mean(axis=1)
+    return np.where(is_call, np.maximum(average - K, 0),
+                    np.maximum(K - average, 0))
+
+
+def _simulate(S_0, K, T, sigma, r, is_call, amount, n_paths, batch_size,
+              seed, antithetic, payoff, n_steps):
+    # sums of the discounted payoffs (y) and of the discounted controls (x)
+    # of every leg, plus one column for the whole position when amount is
+    # given. All the legs use the same normal draws, and only one batch of
+    # paths is in memory at a time.
+    # Without payoff, the legs are European and the control is the terminal
+    # spot. With a path-dependent payoff, the control is the European option
+    # on the same path, whose expectation is its Black-Scholes price.
+    rng = np.random.default_rng(seed)
+    T = T / 365
+    steps = n_steps if payoff is not None else 1
+    dt = T / steps
+    drift = (r - 0.5 * sigma**2) * dt
+    vol = sigma * np.sqrt(dt)
+    disc = np.exp(-r * T)
+    n_cols = len(K) + (amount is not None)
+    sums = {name: np.zeros(n_cols) for name in _sum_names}
+    n = 0
+    while n < n_paths:
+        b = min(batch_size, n_paths - n)
+        z = rng.standard_normal((b, steps, 1))
+        draws = (z, -z) if antithetic else (z,)
+        y = 0
+        x = 0
+        for z in draws:
+            paths = S_0 * np.exp(np.cumsum(drift + vol * z, axis=1))
+            S_T = paths[:, -1]
+            european = np.where(is_call, np.maximum(S_T - K, 0),
+                                np.maximum(K - S_T, 0))
+            if payoff is None:
+                y = y + disc * european / len(draws)
+                x = x + disc * S_T / len(draws)
+            else:
+                y = y + disc * payoff(paths, K, is_call) / len(draws)
+                x = x + disc * european / len(draws)
+        if amount is not None:
+            y = np.hstack([y, y @ amount[:, None]])
+            x = np.hstack([x, x @ amount[:, None]])
+        sums["y"] += y.sum(axis=0)
+        sums["yy"] += (y * y).sum(axis=0)
+        sums["x"] += x.sum(axis=0)
+        sums["xx"] += (x * x).sum(axis=0)
+        sums["xy"] += (x * y).sum(axis=0)
+        n += b
+    sums["n"] = n
+    return sums
+
+
+def _simulate_chunk(args):
+    return _simulate(*args)
+
+
+def mc_price(S_0, K, T, sigma, r, is_call, amount=None, n_paths=200000,
+             batch_size=50000, seed=None, antithetic=True,
+             control_variate=True, processes=None, payoff=None, n_steps=50):
+    # Monte Carlo prices of options under the Black-Scholes model (same
+    # conventions as Option: T in days). Returns the prices and their
+    # standard errors, one per leg, plus the value of the position as last
+    # element when amount is given.
+    # The options are European unless payoff(paths, K, is_call) is given,
+    # in which case paths of n_steps dates are simulated (batch_size is then
+    # better reduced, a batch holding batch_size * n_steps * legs spots).
+    # With antithetic, each sample is the average over z and -z. With
+    # processes > 1, the paths are split over a process pool with
+    # independent random streams (payoff must then be picklable).
+    K = np.atleast_1d(np.asarray(K, dtype=float))
+    T = np.broadcast_to(np.asarray(T, dtype=float), K.shape)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), K.shape)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), K.shape)
+    if amount is not None:
+        amount = np.broadcast_to(np.asarray(amount, dtype=float), K.shape)
+    n_samples = int(n_paths) // (2 if antithetic else 1)
+
+    chunks = processes or 1
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    sizes = [n_samples // chunks + (i < n_samples % chunks)
+             for i in range(chunks)]
+    args = [(S_0, K, T, sigma, r, is_call, amount, size, batch_size,
+             s, antithetic, payoff, n_steps) for size, s in zip(sizes, seeds)]
+    if chunks > 1:
+        with ProcessPoolExecutor(chunks) as pool:
+            results = list(pool.map(_simulate_chunk, args))
+    else:
+        results = [_simulate_chunk(args[0])]
+    n = sum(res["n"] for res in results)
+    mean = {name: sum(res[name] for res in results) / n
+            for name in _sum_names}
+
+    var_y = mean["yy"] - mean["y"]**2
+    price = mean["y"]
+    if control_variate:
+        var_x = mean["xx"] - mean["x"]**2
+        cov = mean["xy"] - mean["x"] * mean["y"]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = np.where(var_x > 0, cov / var_x, 0)
+        if payoff is None:
+            expected_x = np.full(len(K), float(S_0))
+        else:
+            expected_x = bs_price_greeks(S_0, K, T, sigma, r,
+                                         is_call)["BSprice"]
+        if amount is not None:
+            expected_x = np.append(expected_x, expected_x @ amount)
+        price = price - beta * (mean["x"] - expected_x)
+        var_y = var_y - beta * cov
+    std_error = np.sqrt(np.maximum(var_y, 0) * n / (n - 1) / n)
+    return price, std_error
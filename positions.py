@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class PositionStore:
+    # columnar table of option legs: one contiguous array per field and an
+    # index from the leg label to its row. Rows [0, len) are the live legs.
+    float_fields = ("amount", "K", "T", "sigma")
+
+    def __init__(self, capacity=16):
+        self.labels = []
+        self.index = {}
+        self.version = 0
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        n = len(self.labels)
+        old = getattr(self, "_data", None)
+        self._data = {f: np.zeros(capacity) for f in self.float_fields}
+        self._data["is_call"] = np.zeros(capacity, dtype=bool)
+        self._data["maturity_date"] = np.empty(capacity, dtype=object)
+        if old is not None:
+            for f in self._data:
+                self._data[f][:n] = old[f][:n]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.index
+
+    def __getattr__(self, field):
+        # columns of the live legs, e.g. store.K or store.amount
+        if field.startswith("_") or field not in self._data:
+            raise AttributeError(field)
+        return self._data[field][:len(self.labels)]
+
+    def row(self, label):
+        i = self.index[label]
+        return {f: self._data[f][i] for f in self._data}
+
+    def add(self, label, amount, K, T, sigma, is_call, maturity_date=None):
+        # adds amount to an existing leg (removing it when the amount
+        # reaches 0) or appends a new row
+        if label in self.index:
+            i = self.index[label]
+            if self._data["amount"][i] + amount == 0:
+                self.remove(label)
+            else:
+                self._data["amount"][i] += amount
+                self.version += 1
+            return
+        n = len(self.labels)
+        if n == len(self._data["amount"]):
+            self._alloc(2 * n)
+        for f, v in zip(("amount", "K", "T", "sigma", "is_call",
+                         "maturity_date"),
+                        (amount, K, T, sigma, is_call, maturity_date)):
+            self._data[f][n] = v
+        self.labels.append(label)
+        self.index[label] = n
+        self.version += 1
+
+    def remove(self, label):
+        # the last row is moved into the freed slot
+        i = self.index.pop(label)
+        last = len(self.labels) - 1
+        if i != last:
+            for f in self._data:
+                self._data[f][i] = self._data[f][last]
+            self.labels[i] = self.labels[last]
+            self.index[self.labels[i]] = i
+        self._data["maturity_date"][last] = None
+        self.labels.pop()
+        self.version += 1
+
+    def load(self, labels, columns):
+        # replaces all the legs at once, columns being {field: array}
+        self.labels = list(labels)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self._data = None
+        self._alloc(max(16, len(self.labels)))
+        for f, values in columns.items():
+            self._data[f][:len(self.labels)] = values
+        self.version += 1
+
+    def clear(self):
+        self.labels = []
+        self.index = {}
+        self.version += 1
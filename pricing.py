@@ -0,0 +1,109 @@
+import math
+import numpy as np
+from scipy.special import ndtr
+
+# names of the quantities returned by bs_price_greeks, same as the Option
+# attributes
+PRICE_GREEKS = ("BSprice", "Delta", "Gamma", "Vega", "Theta")
+
+
+def norm_cdf(x):
+    # scalar standard normal cdf, much cheaper than scipy.stats.norm.cdf
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+
+def norm_pdf(x):
+    return math.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def option_flags(option_types):
+    # True for calls, False for puts
+    return np.asarray(option_types) == "Call"
+
+
+def bs_price_greeks(S_0, K, T, sigma, r, is_call):
+    # Black-Scholes price and greeks, with the same conventions as Option
+    # (T in days, Theta per day, Vega per 1% of volatility).
+    # Every input can be an array, the outputs are broadcast against each
+    # other, e.g. S_0[:, None] against K[None, :] for a (scenario x leg) grid.
+    S_0 = np.asarray(S_0, dtype=float)
+    K = np.asarray(K, dtype=float)
+    sigma = np.asarray(sigma, dtype=float)
+    r = np.asarray(r, dtype=float)
+    is_call = np.asarray(is_call, dtype=bool)
+    T = np.asarray(T, dtype=float) / 365
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_T = np.sqrt(T)
+        d_1 = (np.log(S_0 / K) + (r + 0.5 * sigma**2) * T) / (sigma * sqrt_T)
+        d_2 = d_1 - sigma * sqrt_T
+        pdf_d1 = np.exp(-0.5 * d_1**2) / np.sqrt(2 * np.pi)
+        cdf_d1 = ndtr(d_1)
+        cdf_d2 = ndtr(d_2)
+        disc = K * np.exp(-r * T)
+
+        call_price = S_0 * cdf_d1 - disc * cdf_d2
+        # put-call parity gives the put from the call without a second cdf
+        put_price = call_price - S_0 + disc
+        theta_common = -(S_0 * sigma * pdf_d1) / (2 * sqrt_T)
+
+        out = {"BSprice": np.where(is_call, call_price, put_price),
+               "Delta": np.where(is_call, cdf_d1, cdf_d1 - 1),
+               "Gamma": pdf_d1 / (S_0 * sigma * sqrt_T),
+               "Vega": S_0 * sqrt_T * pdf_d1 * 0.01,
+               "Theta": np.where(is_call,
+                                 theta_common - r * disc * cdf_d2,
+                                 theta_common + r * disc * (1 - cdf_d2))
+               / 365}
+    return out
+
+
+def implied_vol(price, S_0, K, T, r, is_call, q=0, tol=1e-8, max_iter=100,
+                sigma_max=5.):
+    # volatilities for which bs_price_greeks gives back the prices, for
+    # every row at once (T in days, q continuous dividend yield).
+    # Newton steps safeguarded by a bracket of the root: a step leaving the
+    # bracket is replaced by a bisection. Only the rows not converged yet are
+    # recomputed at each iteration.
+    # Returns the volatilities (nan where not converged) and the mask of the
+    # converged rows. Prices out of the no-arbitrage bounds never converge.
+    price, S_0, K, T, r, q, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(S_0, dtype=float),
+        np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(q, dtype=float),
+        np.asarray(is_call, dtype=bool))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # the dividend yield is taken into account through the spot
+        S = S_0 * np.exp(-q * T / 365)
+        disc = K * np.exp(-r * T / 365)
+        lower = np.maximum(np.where(is_call, S - disc, disc - S), 0)
+        upper = np.where(is_call, S, disc)
+        valid = (price > lower) & (price < upper) & (T > 0) & (K > 0)\
+            & (S > 0)
+        # starting point: volatility matching the moneyness
+        guess = np.sqrt(2 * np.abs(np.log(S / disc)) / (T / 365))
+    sigma = np.where(np.isfinite(guess), np.clip(guess, 0.1, 1), 0.3)
+    lo = np.zeros(price.shape)
+    hi = np.full(price.shape, float(sigma_max))
+    converged = np.zeros(price.shape, dtype=bool)
+    active = np.flatnonzero(valid)
+    for i in range(max_iter):
+        if len(active) == 0:
+            break
+        s = sigma.flat[active]
+        res = bs_price_greeks(S.flat[active], K.flat[active], T.flat[active],
+                              s, r.flat[active], is_call.flat[active])
+        diff = res["BSprice"] - price.flat[active]
+        done = np.abs(diff) < tol
+        converged.flat[active[done]] = True
+        # the price increases with the volatility
+        lo.flat[active] = np.where(diff < 0, s, lo.flat[active])
+        hi.flat[active] = np.where(diff > 0, s, hi.flat[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = s - diff / (res["Vega"] * 100)
+        l, h = lo.flat[active], hi.flat[active]
+        step = np.where(np.isfinite(newton) & (newton > l) & (newton < h),
+                        newton, 0.5 * (l + h))
+        active = active[~done]
+        sigma.flat[active] = step[~done]
+    return np.where(converged, sigma, np.nan), converged
@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# what option_chain returns, like yfinance's Ticker.option_chain
+OptionChainData = namedtuple("OptionChainData", "calls puts")
+
+
+class MarketDataProvider:
+    # source of the market data used by finance_api
+
+    def info(self, ticker):
+        # dict with at least currency, bid, ask, previousClose and
+        # dividendYield
+        raise NotImplementedError
+
+    def expiries(self, ticker):
+        raise NotImplementedError
+
+    def option_chain(self, ticker, maturity):
+        # OptionChainData of DataFrames with yahoo's column names
+        raise NotImplementedError
+
+    def fx_rate(self, source, target):
+        raise NotImplementedError
+
+    def history(self, ticker, start=None, end=None):
+        # daily closes, as a Series indexed by date
+        raise NotImplementedError
+
+
+class YahooProvider(MarketDataProvider):
+    # live data from yahoo finance and forex_python
+
+    def info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+    def expiries(self, ticker):
+        import yfinance as yf
+        return list(yf.Ticker(ticker).options)
+
+    def option_chain(self, ticker, maturity):
+        import yfinance as yf
+        chain = yf.Ticker(ticker).option_chain(maturity)
+        return OptionChainData(chain.calls, chain.puts)
+
+    def fx_rate(self, source, target):
+        from fx_rates import forex_rate
+        return forex_rate(source, target)
+
+    def history(self, ticker, start=None, end=None):
+        import yfinance as yf
+        if start is None:
+            frame = yf.Ticker(ticker).history(period="1y")
+        else:
+            frame = yf.Ticker(ticker).history(start=start, end=end)
+        return frame["Close"]
+
+
+class SnapshotProvider(MarketDataProvider):
+    # replays recorded data: data is a dict with the keys
+    #   "info": {ticker: info}, "expiries": {ticker: [maturity]},
+    #   "chains": {(ticker, maturity, "Call" or "Put"): DataFrame},
+    #   "fx": {(source, target): rate}
+    # Missing data raises a KeyError, as a failed request would.
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.data = {kind: dict(data.get(kind, {}))
+                     for kind in ("info", "expiries", "chains", "fx")}
+
+    def info(self, ticker):
+        return self.data["info"][ticker]
+
+    def expiries(self, ticker):
+        return list(self.data["expiries"][ticker])
+
+    def chain(self, ticker, maturity, option_type):
+        return self.data["chains"][(ticker, maturity, option_type)]
+
+    def option_chain(self, ticker, maturity):
+        return OptionChainData(self.chain(ticker, maturity, "Call"),
+                               self.chain(ticker, maturity, "Put"))
+
+    def fx_rate(self, source, target):
+        if (source, target) in self.data["fx"]:
+            return self.data["fx"][(source, target)]
+        return 1 / self.data["fx"][(target, source)]
+
+    def save(self, path):
+        save_snapshot(self.data, path)
+
+
+class RecordingProvider(MarketDataProvider):
+    # forwards to another provider and keeps a copy of everything it
+    # returned, to be saved as a snapshot
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.snapshot = SnapshotProvider()
+        self._lock = threading.Lock()
+
+    def _record(self, kind, key, value):
+        with self._lock:
+            self.snapshot.data[kind][key] = value
+        return value
+
+    def info(self, ticker):
+        return self._record("info", ticker, self.provider.info(ticker))
+
+    def expiries(self, ticker):
+        return self._record("expiries", ticker,
+                            list(self.provider.expiries(ticker)))
+
+    def option_chain(self, ticker, maturity):
+        chain = self.provider.option_chain(ticker, maturity)
+        self._record("chains", (ticker, maturity, "Call"), chain.calls)
+        self._record("chains", (ticker, maturity, "Put"), chain.puts)
+        return chain
+
+    def fx_rate(self, source, target):
+        return self._record("fx", (source, target),
+                            self.provider.fx_rate(source, target))
+
+    def save(self, path):
+        with self._lock:
+            self.snapshot.save(path)
+
+
+# On disk, a snapshot is a directory with a meta.json (quotes, expiries, fx
+# rates and the row range of each chain) and one .npy file per chain
+# column, holding the rows of all the chains one after the other. The
+# columns are memory-mapped when the snapshot is loaded.
+
+def save_snapshot(data, path):
+    os.makedirs(path, exist_ok=True)
+    keys = list(data.get("chains", {}))
+    frames = [data["chains"][k] for k in keys]
+    table = pd.concat(frames, ignore_index=True) if frames\
+        else pd.DataFrame()
+    bounds = np.cumsum([0] + [len(f) for f in frames])
+    columns = []
+    for i, name in enumerate(table.columns):
+        col = table[name]
+        if isinstance(col.dtype, pd.DatetimeTZDtype):
+            kind, values = "datetime_utc", col.dt.tz_convert("UTC")\
+                .dt.tz_localize(None).to_numpy("datetime64[ns]").view("i8")
+        elif pd.api.types.is_datetime64_any_dtype(col):
+            kind, values = "datetime", col.to_numpy("datetime64[ns]")\
+                .view("i8")
+        elif pd.api.types.is_bool_dtype(col)\
+                or pd.api.types.is_numeric_dtype(col):
+            kind, values = "num", col.to_numpy()
+        else:
+            kind, values = "str", col.astype(str).to_numpy(dtype=str)
+        np.save(os.path.join(path, "{}.npy".format(i)), values)
+        columns.append([name, kind])
+    meta = {"info": data.get("info", {}),
+            "expiries": data.get("expiries", {}),
+            "fx": [[s, t, r] for (s, t), r in data.get("fx", {}).items()],
+            "chains": [list(k) + [int(bounds[i]), int(bounds[i + 1])]
+                       for i, k in enumerate(keys)],
+            "columns": columns}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, default=str)
+
+
+class _LazyChains(dict):
+    # {(ticker, maturity, type): DataFrame}, the frames being built from the
+    # memory-mapped columns on first access
+    def __init__(self, path, meta):
+        super().__init__()
+        self.bounds = {tuple(c[:3]): (c[3], c[4]) for c in meta["chains"]}
+        self.columns = [(name, kind, np.load(
+            os.path.join(path, "{}.npy".format(i)), mmap_mode="r"))
+            for i, (name, kind) in enumerate(meta["columns"])]
+
+    def __contains__(self, key):
+        return key in self.bounds
+
+    def __iter__(self):
+        return iter(self.bounds)
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __missing__(self, key):
+        start, stop = self.bounds[key]
+        frame = {}
+        for name, kind, values in self.columns:
+            values = np.array(values[start:stop])
+            if kind == "datetime_utc":
+                values = pd.to_datetime(values, utc=True)
+            elif kind == "datetime":
+                values = pd.to_datetime(values)
+            frame[name] = values
+        self[key] = pd.DataFrame(frame)
+        return self[key]
+
+    def items(self):
+        return ((k, self[k]) for k in self.bounds)
+
+
+def load_snapshot(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    provider = SnapshotProvider({
+        "info": meta["info"], "expiries": meta["expiries"],
+        "fx": {(s, t): r for s, t, r in meta["fx"]}})
+    provider.data["chains"] = _LazyChains(path, meta)
+    return provider
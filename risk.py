@@ -0,0 +1,206 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pricing import bs_price_greeks
+
+# fields of a shock: relative spot move, absolute volatility and rate
+# shifts, and days passed
+shock_fields = ("spot", "vol", "rate", "days")
+
+
+class GridShocks:
+    # every combination of the given shocks of each field (stress grid)
+    def __init__(self, spot=(0,), vol=(0,), rate=(0,), days=(0,)):
+        self.axes = [np.atleast_1d(np.asarray(a, dtype=float))
+                     for a in (spot, vol, rate, days)]
+        self.shape = tuple(len(a) for a in self.axes)
+        self.n = int(np.prod(self.shape))
+
+    def chunk(self, start, stop):
+        index = np.unravel_index(np.arange(start, stop), self.shape)
+        return {name: axis[i] for name, axis, i in
+                zip(shock_fields, self.axes, index)}
+
+
+class HistoricalShocks:
+    # spot moves over horizon (in rows of closes) observed in the history
+    # (see backtest.load_history), days being the days passed meanwhile
+    def __init__(self, closes, horizon=1, days=None):
+        closes = np.asarray(closes, dtype=float)
+        self.moves = closes[horizon:] / closes[:-horizon] - 1
+        self.days = horizon if days is None else days
+        self.n = len(self.moves)
+
+    def chunk(self, start, stop):
+        spot = self.moves[start:stop]
+        zeros = np.zeros(len(spot))
+        return {"spot": spot, "vol": zeros, "rate": zeros,
+                "days": np.full(len(spot), float(self.days))}
+
+
+class MonteCarloShocks:
+    # n joint shocks over days: lognormal spot of volatility vol, normal
+    # volatility and rate shifts (annualized vol_of_vol and rate_vol), the
+    # volatility shift having a correlation with the spot return.
+    # The draws are made by blocks of fixed size, each from its own seeded
+    # stream, so that a shock only depends on the seed and its index,
+    # however the shocks are chunked and spread over processes.
+    block = 4096
+
+    def __init__(self, n, days=1, vol=0.2, vol_of_vol=0, rate_vol=0,
+                 correlation=0, seed=0):
+        self.n = n
+        self.days = days
+        self.vol = vol
+        self.vol_of_vol = vol_of_vol
+        self.rate_vol = rate_vol
+        self.correlation = correlation
+        self.seed = seed
+
+    def chunk(self, start, stop):
+        first = start // self.block
+        z = np.concatenate([
+            np.random.default_rng([self.seed, b]).standard_normal(
+                (3, self.block))
+            for b in range(first, (stop - 1) // self.block + 1)], axis=1)
+        z = z[:, start - first * self.block:stop - first * self.block]
+        sqrt_dt = np.sqrt(self.days / 365)
+        rho = self.correlation
+        return {"spot": np.exp(-0.5 * self.vol**2 * self.days / 365
+                               + self.vol * sqrt_dt * z[0]) - 1,
+                "vol": self.vol_of_vol * sqrt_dt
+                * (rho * z[0] + np.sqrt(1 - rho**2) * z[1]),
+                "rate": self.rate_vol * sqrt_dt * z[2],
+                "days": np.full(stop - start, float(self.days))}
+
+
+def _values(table, shocks):
+    # value of the legs and stocks of table for each shock
+    S = table["S_0"] * (1 + shocks["spot"][:, None])
+    res = bs_price_greeks(S, table["K"],
+                          np.maximum(table["T"] - shocks["days"][:, None],
+                                     1e-6),
+                          np.maximum(table["sigma"] + shocks["vol"][:, None],
+                                     1e-4),
+                          table["r"] + shocks["rate"][:, None],
+                          table["is_call"])["BSprice"]
+    stocks = table["stock_S_0"] * (1 + shocks["spot"][:, None])
+    return res @ table["amount"] + stocks @ table["stocks"]
+
+
+def _chunk_pnl(args):
+    table, shocks, start, stop = args
+    return _values(table, shocks.chunk(start, stop)) - table["base"]
+
+
+class RiskEngine:
+    # P&L of a position (legs of one or many strategies) under sets of
+    # shocks (GridShocks, HistoricalShocks, MonteCarloShocks), evaluated in
+    # chunks of about chunk_elements (shocks x legs) values, optionally over
+    # a process pool. run() only keeps the tail of the losses needed for
+    # the VaR and expected shortfall, so its memory does not grow with the
+    # number of shocks.
+
+    def __init__(self, table, chunk_elements=2000000, processes=None):
+        self.table = {k: np.asarray(v) for k, v in table.items()}
+        zero = {name: np.zeros(1) for name in shock_fields}
+        self.table["base"] = float(_values(self.table, zero)[0])
+        self.chunk_elements = chunk_elements
+        self.processes = processes
+
+    @classmethod
+    def from_strategy(cls, strategy, **kwargs):
+        return cls.from_strategies([(strategy, 1.)], **kwargs)
+
+    @classmethod
+    def from_book(cls, book, **kwargs):
+        # every strategy of a Book (see book.py), in the book currency. The
+        # relative spot shocks apply to every underlying.
+        return cls.from_strategies(
+            [(s, s.api.fx.rate(s.source_currency, book.currency))
+             for s in book.strategies.values()], **kwargs)
+
+    @classmethod
+    def from_strategies(cls, strategies, **kwargs):
+        # strategies: [(Strategy, fx rate to the reporting currency)]
+        cols = {k: [] for k in ("S_0", "K", "T", "sigma", "r", "is_call",
+                                "amount")}
+        stock_S_0, stocks = [], []
+        for s, rate in strategies:
+            legs = s.legs()
+            n = len(legs["K"])
+            for k in ("K", "T", "sigma", "is_call"):
+                cols[k].append(np.array(legs[k]))
+            cols["amount"].append(np.array(legs["amount"]) * rate)
+            cols["S_0"].append(np.full(n, float(s.S_0)))
+            cols["r"].append(np.full(n, float(s.r)))
+            stock_S_0.append(float(s.S_0))
+            stocks.append(s.stocks * rate)
+        table = {k: np.concatenate(v) if v else np.array([])
+                 for k, v in cols.items()}
+        table["is_call"] = table["is_call"].astype(bool)
+        table["stock_S_0"] = np.array(stock_S_0)
+        table["stocks"] = np.array(stocks)
+        return cls(table, **kwargs)
+
+    def _ranges(self, n):
+        rows = max(1, self.chunk_elements // max(1, len(self.table["K"])))
+        return [(start, min(start + rows, n)) for start in range(0, n, rows)]
+
+    def _chunks(self, shocks):
+        # (start, pnl) of each chunk of shocks
+        args = [(self.table, shocks, start, stop)
+                for start, stop in self._ranges(shocks.n)]
+        if self.processes and self.processes > 1:
+            with ProcessPoolExecutor(self.processes) as pool:
+                yield from zip((a[2] for a in args),
+                               pool.map(_chunk_pnl, args))
+        else:
+            for a in args:
+                yield a[2], _chunk_pnl(a)
+
+    def pnl(self, shocks):
+        # P&L of every shock (the whole array is kept)
+        return np.concatenate([p for start, p in self._chunks(shocks)])
+
+    def run(self, shocks, levels=(0.95, 0.99), n_worst=10):
+        # VaR and expected shortfall (as positive losses) at each level,
+        # mean and standard deviation of the P&L, and table of the n_worst
+        # shocks
+        n = shocks.n
+        k = min(n, max(n_worst, int(np.ceil((1 - min(levels)) * n)) + 2))
+        tail = np.array([])
+        tail_index = np.array([], dtype=int)
+        total = total_sq = 0.
+        for start, pnl in self._chunks(shocks):
+            total += pnl.sum()
+            total_sq += (pnl * pnl).sum()
+            tail = np.concatenate([tail, pnl])
+            tail_index = np.concatenate([tail_index,
+                                         start + np.arange(len(pnl))])
+            if len(tail) > k:
+                keep = np.argpartition(tail, k - 1)[:k]
+                tail, tail_index = tail[keep], tail_index[keep]
+        order = np.argsort(tail, kind="stable")
+        tail, tail_index = tail[order], tail_index[order]
+
+        mean = total / n
+        out = {"n": n, "mean": mean,
+               "std": np.sqrt(max(total_sq / n - mean**2, 0)),
+               "VaR": {}, "ES": {}}
+        for level in levels:
+            # same interpolation as np.quantile
+            q = (1 - level) * (n - 1)
+            i = int(np.floor(q))
+            quantile = tail[i] + (q - i) * (tail[min(i + 1, k - 1)]
+                                            - tail[i])
+            m = max(1, int(np.ceil((1 - level) * n)))
+            out["VaR"][level] = -quantile
+            out["ES"][level] = -tail[:m].mean()
+
+        worst = [shocks.chunk(i, i + 1) for i in tail_index[:n_worst]]
+        out["worst"] = pd.DataFrame(
+            {name: [w[name][0] for w in worst] for name in shock_fields},
+            index=tail_index[:n_worst])
+        out["worst"]["P&L"] = tail[:n_worst]
+        return out
@@ -0,0 +1,175 @@
+import threading
+import numpy as np
+from pricing import PRICE_GREEKS, bs_price_greeks
+
+
+def _lattice_weights(axis, x):
+    # lower index and weight of the upper neighbour for a linear
+    # interpolation of x on a regular increasing axis
+    x = np.clip(x, axis[0], axis[-1])
+    if len(axis) == 1:
+        return np.zeros(np.shape(x), dtype=int), np.zeros(np.shape(x))
+    pos = (x - axis[0]) / (axis[1] - axis[0])
+    i = np.minimum(np.floor(pos).astype(int), len(axis) - 2)
+    return i, pos - i
+
+
+def _interpolate(lower, upper, w):
+    # lower * (1 - w) + upper * w, a neighbour of zero weight being skipped
+    # so that its NaN values (legs expired at that day) are not propagated
+    return np.where(w == 0, lower,
+                    np.where(w == 1, upper, lower * (1 - w) + upper * w))
+
+
+class ScenarioCube:
+    # price and greeks of a set of legs (without the stocks) on a
+    # (spot offset x day shift x vol shift) lattice around S_0.
+    # The values are sums over the legs weighted by their amount, so a leg
+    # can be added or removed by adding its own contribution.
+
+    def __init__(self, S_0, r, max_day, vol_start, vol_end=0.3,
+                 spot_offsets=np.linspace(-1, 1, 401), vol_step=0.01):
+        self.S_0 = S_0
+        self.r = r
+        self.spot_offsets = np.asarray(spot_offsets, dtype=float)
+        self.days = np.arange(max_day + 1, dtype=float)
+        # integer multiples of vol_step, so that 0 is a lattice point
+        self.vol_shifts = vol_step * np.arange(
+            np.ceil(vol_start / vol_step - 1e-9),
+            np.floor(vol_end / vol_step + 1e-9) + 1)
+        self.values = np.zeros((len(PRICE_GREEKS), len(self.spot_offsets),
+                                len(self.days), len(self.vol_shifts)))
+
+    @property
+    def key(self):
+        return (self.S_0, self.r)
+
+    def contains(self, forward, shift_time, shift_vol):
+        offsets = np.asarray(forward) / self.S_0 - 1
+        return (offsets.min() >= self.spot_offsets[0] - 1e-12
+                and offsets.max() <= self.spot_offsets[-1] + 1e-12
+                and 0 <= shift_time <= self.days[-1]
+                and self.vol_shifts[0] - 1e-12 <= shift_vol
+                <= self.vol_shifts[-1] + 1e-12)
+
+    def add_legs(self, amount, K, T, sigma, is_call, chunk_size=8):
+        # adds amount x (price, greeks) of the legs, by chunks of chunk_size
+        # legs and one day at a time, so that memory stays bounded by
+        # (spots x vols x chunk_size) whatever the number of legs
+        amount = np.asarray(amount, dtype=float)
+        K, T, sigma, is_call = (np.asarray(a) for a in (K, T, sigma, is_call))
+        spots = self.S_0 * (1 + self.spot_offsets)
+        spots = np.where(spots == 0, self.S_0, spots)[:, None, None]
+        for start in range(0, amount.size, chunk_size):
+            legs = slice(start, start + chunk_size)
+            vols = sigma[legs][None, None, :]\
+                + self.vol_shifts[None, :, None]
+            for j, day in enumerate(self.days):
+                res = bs_price_greeks(spots, K[legs], T[legs] - day, vols,
+                                      self.r, is_call[legs])
+                for n, name in enumerate(PRICE_GREEKS):
+                    self.values[n, :, j, :] += res[name] @ amount[legs]
+
+    def lookup(self, forward, shift_time, shift_vol):
+        # linear interpolation between the lattice points
+        offsets = np.asarray(forward, dtype=float) / self.S_0 - 1
+        i, wi = _lattice_weights(self.spot_offsets, offsets)
+        j, wj = _lattice_weights(self.days, float(shift_time))
+        k, wk = _lattice_weights(self.vol_shifts, float(shift_vol))
+        out = {}
+        for n, name in enumerate(PRICE_GREEKS):
+            v = self.values[n]
+            if len(self.days) > 1:
+                v = _interpolate(v[:, j, :], v[:, j + 1, :], wj)
+            else:
+                v = v[:, 0, :]
+            if len(self.vol_shifts) > 1:
+                v = _interpolate(v[:, k], v[:, k + 1], wk)
+            else:
+                v = v[:, 0]
+            out[name] = _interpolate(v[i], v[i + 1], wi)
+        return out
+
+
+class CubeBuilder:
+    # keeps the cube of a Strategy up to date: full builds run in a
+    # background thread, leg changes are applied incrementally when possible.
+    # The lattice (spot_points from -100% to +100%, vol_step) is coarse
+    # enough for a build to take a fraction of a second at max_legs legs;
+    # above, there is no cube and the grids are priced directly.
+
+    def __init__(self, strategy, max_day=45, vol_step=0.02, spot_points=201,
+                 max_legs=20):
+        self.strategy = strategy
+        self.max_day = max_day
+        self.vol_step = vol_step
+        self.spot_offsets = np.linspace(-1, 1, spot_points)
+        self.max_legs = max_legs
+        self.cube = None
+        self.lock = threading.Lock()
+        self._thread = None
+        self._version = None
+
+    def ready(self):
+        # the cube, if it matches the current legs, spot and rate
+        s = self.strategy
+        if len(s.positions) > self.max_legs:
+            return None
+        with self.lock:
+            cube = self.cube
+            if cube is None or cube.key != (s.S_0, s.r)\
+                    or self._version != s.positions.version:
+                cube = None
+        if cube is None:
+            self.request_build()
+        return cube
+
+    def request_build(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._build, daemon=True)
+        self._thread.start()
+
+    def _build(self):
+        s = self.strategy
+        while True:
+            with self.lock:
+                p = s.positions
+                version = p.version
+                legs = {f: getattr(p, f).copy()
+                        for f in ("amount", "K", "T", "sigma", "is_call")}
+            min_T = int(legs["T"].min()) if legs["T"].size else 0
+            min_sigma = legs["sigma"].min() if legs["T"].size else 0
+            # the lowest vol shift leaves every leg a positive volatility
+            # (their greeks are NaN at a zero volatility)
+            cube = ScenarioCube(s.S_0, s.r, max(0, min(min_T, self.max_day)),
+                                -min_sigma + self.vol_step,
+                                spot_offsets=self.spot_offsets,
+                                vol_step=self.vol_step)
+            cube.add_legs(legs["amount"], legs["K"], legs["T"],
+                          legs["sigma"], legs["is_call"])
+            with self.lock:
+                if p.version == version and s.positions is p:
+                    self.cube, self._version = cube, version
+                    return
+
+    def leg_changed(self, old_version, amount, K, T, sigma, is_call,
+                    removed, stored=None):
+        # called with self.lock held, right after the amount of one leg
+        # changed, stored being the row of the leg before the change (None
+        # for a new leg). The cube is updated in place unless the leg
+        # expires inside the cube (its NaN values could not be taken back
+        # out), its volatility is not above the vol lattice, or the store
+        # kept other inputs than the ones given for an existing leg.
+        cube = self.cube
+        if cube is None or self._version != old_version:
+            self.cube = None
+        elif (removed and T < cube.days[-1])\
+                or sigma + cube.vol_shifts[0] <= 1e-12:
+            self.cube = None
+        elif stored is not None and (stored["sigma"], stored["T"],
+                                     stored["K"]) != (sigma, T, K):
+            self.cube = None
+        else:
+            cube.add_legs([amount], [K], [T], [sigma], [is_call])
+            self._version = self.strategy.positions.version
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# kind of change for each key of the state of the controls. Only the stages
+# depending on what changed are rerun.
+change_kinds = {"rate": "rate", "shift_time": "shift", "shift_vol": "shift",
+                "step": "step", "greek": "greek", "stocks": "stocks",
+                "legs": "legs", "ticker": "ticker", "spot": "spot"}
+
+
+def classify(old, new):
+    # kinds of the changes between two states of the controls
+    if old is None:
+        return set(change_kinds[k] for k in new)
+    return set(change_kinds[k] for k in new if old.get(k) != new[k])
+
+
+class UpdateScheduler:
+    # runs the recomputation of a Bokeh document off its event loop.
+    # request(state) is called by the widget callbacks with the state of the
+    # controls. Requests are throttled (one run per throttle seconds at
+    # most), queued requests collapse into the latest state, and a result
+    # computed for a state that is no longer the latest one is dropped.
+    #   compute(state, changes) runs in the executor,
+    #   apply(state, changes, result) runs on the document's event loop.
+
+    def __init__(self, doc, compute, apply, throttle=0.1, executor=None):
+        self.doc = doc
+        self.compute = compute
+        self.apply = apply
+        self.throttle = throttle
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.applied = None
+        self.latest = None
+        self.dropped = 0
+        self._scheduled = False
+        self._running = False
+
+    def request(self, state):
+        self.latest = dict(state)
+        if not self._scheduled and not self._running:
+            self._scheduled = True
+            self.doc.add_timeout_callback(self._start,
+                                          int(self.throttle * 1000))
+
+    def _start(self):
+        self._scheduled = False
+        state = self.latest
+        changes = classify(self.applied, state)
+        if not changes:
+            return
+        self._running = True
+        future = self.executor.submit(self.compute, state, changes)
+        future.add_done_callback(lambda f: self.doc.add_next_tick_callback(
+            partial(self._finish, state, changes, f)))
+
+    def _finish(self, state, changes, future):
+        self._running = False
+        if self.latest is not state:
+            # stale: start again from the latest state
+            self.dropped += 1
+            self._start()
+            return
+        result = future.result()
+        self.apply(state, changes, result)
+        self.applied = state
+
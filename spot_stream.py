@@ -0,0 +1,114 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PollingSpotSource:
+    # spot polled from the market data of a finance_api (see
+    # finance_api.get_live_price): the sessions of a server polling the
+    # same ticker share one quote request per period
+    def __init__(self, api):
+        self.api = api
+
+    def latest(self, ticker):
+        return self.api.get_live_price(ticker)
+
+
+class FileSpotSource:
+    # local stand-in for a price feed: a text file whose lines are
+    # "TICKER,price" (or just "price" for any ticker), the last line for the
+    # ticker being its current spot. The file is only read when it changed.
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._spots = {}
+
+    def latest(self, ticker):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            self._mtime = mtime
+            spots = {}
+            with open(self.path) as f:
+                for line in f:
+                    fields = line.strip().split(",")
+                    if fields == [""]:
+                        continue
+                    key = fields[0] if len(fields) > 1 else None
+                    spots[key] = float(fields[-1])
+            self._spots = spots
+        return self._spots.get(ticker, self._spots.get(None))
+
+
+class PushSpotSource:
+    # spots pushed by another thread, e.g. one reading a socket
+    def __init__(self):
+        self._spots = {}
+
+    def push(self, ticker, spot):
+        self._spots[ticker] = spot
+
+    def latest(self, ticker):
+        return self._spots.get(ticker)
+
+
+class SpotStreamer:
+    # reprices a Strategy on each new spot of a source. tick() is meant to be
+    # called periodically (e.g. by Bokeh's add_periodic_callback); the
+    # reprice runs in a worker thread and ticks arriving while it is in
+    # flight are dropped. When a reprice takes longer than latency_budget
+    # (in seconds), the following ticks are skipped to let it catch up.
+    # on_update(spot, aggregates) is called from the worker thread. Errors of
+    # a reprice are counted in stats["errors"] and printed.
+
+    def __init__(self, strategy, source, on_update=None, latency_budget=0.2,
+                 lock=None):
+        self.strategy = strategy
+        self.source = source
+        self.on_update = on_update
+        self.latency_budget = latency_budget
+        self.lock = lock or threading.RLock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = {"ticks": 0, "dropped": 0, "reprices": 0,
+                      "over_budget": 0, "last_latency": None, "errors": 0,
+                      "last_error": None}
+        self._in_flight = False
+        self._skip = 0
+
+    def tick(self):
+        self.stats["ticks"] += 1
+        if self._in_flight or self._skip > 0:
+            self._skip = max(0, self._skip - 1)
+            self.stats["dropped"] += 1
+            return False
+        self._in_flight = True
+        self.executor.submit(self._reprice)
+        return True
+
+    def _reprice(self):
+        try:
+            start = time.perf_counter()
+            spot = self.source.latest(self.strategy.ticker)
+            if spot is None or spot == self.strategy.S_0:
+                return
+            with self.lock:
+                aggregates = self.strategy.update_spot(spot)
+            if self.on_update is not None:
+                self.on_update(spot, aggregates)
+            latency = time.perf_counter() - start
+            self.stats["reprices"] += 1
+            self.stats["last_latency"] = latency
+            if latency > self.latency_budget:
+                self.stats["over_budget"] += 1
+                self._skip = math.ceil(latency / self.latency_budget) - 1
+        except Exception as e:
+            # the executor would keep the exception in a future nobody reads
+            self.stats["errors"] += 1
+            self.stats["last_error"] = e
+            print("Spot reprice failed: {!r}".format(e))
+        finally:
+            self._in_flight = False
@@ -0,0 +1,195 @@
+import json
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+from OptionClass import Strategy
+from pricing import PRICE_GREEKS, bs_price_greeks
+
+# A library of strategies is a directory with one .npy file per column:
+# the legs of all the strategies one after the other, and one row per
+# strategy. Columns are memory-mapped on loading. T is saved in days to
+# maturity at the valuation date of the library, and decayed by the days
+# passed since when it is loaded. Legs expired meanwhile are settled at
+# their intrinsic value by revalue, and left out of the loaded strategies.
+leg_fields = ("amount", "K", "T", "sigma", "is_call", "maturity_date",
+              "label", "owner")
+strategy_fields = ("name", "ticker", "currency", "stocks", "r", "q", "S_0",
+                   "start")
+format_version = 1
+
+
+def save_library(strategies, path, names=None, valuation_date=None):
+    # strategies: list of Strategy, names defaulting to their position,
+    # valuation_date (default today) the date their T are counted from
+    os.makedirs(path, exist_ok=True)
+    names = names or [str(i) for i in range(len(strategies))]
+    sizes = [len(s.positions) for s in strategies]
+    start = np.cumsum([0] + sizes)[:-1]
+    legs = {f: [] for f in leg_fields}
+    for i, s in enumerate(strategies):
+        p = s.positions
+        for f in ("amount", "K", "T", "sigma", "is_call"):
+            legs[f].append(getattr(p, f))
+        legs["maturity_date"].append(["" if m is None else str(m)
+                                      for m in p.maturity_date])
+        legs["label"].append(p.labels)
+        legs["owner"].append(np.full(len(p), i, dtype=np.int32))
+    columns = {f: np.concatenate(v) if v else np.array([])
+               for f, v in legs.items()}
+    columns["is_call"] = columns["is_call"].astype(bool)
+    columns["maturity_date"] = columns["maturity_date"].astype(str)
+    columns["label"] = columns["label"].astype(str)
+    columns["owner"] = columns["owner"].astype(np.int32)
+    columns.update({
+        "name": np.array(names, dtype=str),
+        "ticker": np.array([s.ticker for s in strategies], dtype=str),
+        "currency": np.array([s.currency for s in strategies], dtype=str),
+        "stocks": np.array([s.stocks for s in strategies], dtype=float),
+        "r": np.array([s.r for s in strategies], dtype=float),
+        "q": np.array([s.q for s in strategies], dtype=float),
+        "S_0": np.array([s.S_0 for s in strategies], dtype=float),
+        "start": np.asarray(start, dtype=np.int64)})
+    for f, values in columns.items():
+        np.save(os.path.join(path, f + ".npy"), values)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"format": format_version, "strategies": len(strategies),
+                   "legs": int(sum(sizes)),
+                   "valuation_date": str(valuation_date or date.today())},
+                  f)
+
+
+def save_strategy(strategy, path, name="0", valuation_date=None):
+    save_library([strategy], path, [name], valuation_date)
+
+
+def _decayed_label(label, T):
+    # label of a leg (see OptionClass.leg_label) with T days to maturity,
+    # T being written like the saved one
+    head, days = label.rsplit(", ", 1)
+    if "." not in days:
+        T = int(round(T))
+    return "{}, {} days".format(head, T)
+
+
+class StrategyLibrary:
+    # saved strategies, revalued from the memory-mapped columns without
+    # building Strategy or Option objects. elapsed is the number of days
+    # from the valuation date of the library to today.
+
+    def __init__(self, path, today=None):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        saved = self.meta.get("valuation_date")
+        self.elapsed = 0 if saved is None else\
+            ((today or date.today()) - date.fromisoformat(saved)).days
+        self.columns = {f: np.load(os.path.join(path, f + ".npy"),
+                                   mmap_mode="r")
+                        for f in leg_fields + strategy_fields}
+        self.n_legs = self.meta["legs"]
+
+    def __len__(self):
+        return self.meta["strategies"]
+
+    @property
+    def names(self):
+        return list(self.columns["name"])
+
+    def find(self, name):
+        # row of a strategy, or -1
+        rows = np.flatnonzero(self.columns["name"] == name)
+        return int(rows[0]) if len(rows) else -1
+
+    def legs(self, i):
+        # columns of the legs of strategy i (views on the mapped files, T
+        # being the saved one)
+        start = int(self.columns["start"][i])
+        stop = int(self.columns["start"][i + 1]) if i + 1 < len(self)\
+            else self.n_legs
+        return {f: self.columns[f][start:stop] for f in leg_fields}
+
+    def revalue(self, spots=None, shift_time=0, shift_vol=0, r=None,
+                chunk_size=1000000):
+        # price and greeks of every strategy, at the saved spots or at
+        # spots={ticker: spot}, in chunks of chunk_size legs. Returns a
+        # DataFrame indexed by name, with the number of legs settled at
+        # their intrinsic value (expired, or by shift_time).
+        c = self.columns
+        S = np.array(c["S_0"])
+        if spots:
+            for ticker, spot in spots.items():
+                S[c["ticker"] == ticker] = spot
+        rates = np.array(c["r"]) if r is None else np.full(len(self), r)
+        out = {name: np.zeros(len(self)) for name in PRICE_GREEKS}
+        settled = np.zeros(len(self), dtype=int)
+        for start in range(0, self.n_legs, chunk_size):
+            rows = slice(start, start + chunk_size)
+            owner = c["owner"][rows]
+            K = c["K"][rows]
+            is_call = c["is_call"][rows]
+            T = c["T"][rows] - self.elapsed - shift_time
+            expired = T <= 0
+            res = bs_price_greeks(S[owner], K, np.where(expired, 1., T),
+                                  c["sigma"][rows] + shift_vol,
+                                  rates[owner], is_call)
+            if expired.any():
+                payoff = np.maximum(np.where(is_call, S[owner] - K,
+                                             K - S[owner]), 0)
+                res = {name: np.where(expired, payoff if name == "BSprice"
+                                      else 0., res[name])
+                       for name in PRICE_GREEKS}
+                settled += np.bincount(owner, expired, minlength=len(self))\
+                    .astype(int)
+            amount = c["amount"][rows]
+            for name in PRICE_GREEKS:
+                out[name] += np.bincount(owner, res[name] * amount,
+                                         minlength=len(self))
+        out["BSprice"] += S * c["stocks"]
+        out["Delta"] += c["stocks"]
+        out["Settled legs"] = settled
+        frame = pd.DataFrame(out, index=pd.Index(self.names, name="name"))
+        frame.insert(0, "ticker", np.array(c["ticker"]))
+        frame.insert(1, "S_0", S)
+        return frame
+
+    def expired(self, i):
+        # labels of the legs of strategy i expired since the save
+        legs = self.legs(i)
+        return [str(label) for label, T in zip(legs["label"], legs["T"])
+                if T - self.elapsed <= 0]
+
+    def strategy(self, i, provider=None, service=None):
+        # Strategy of row i, its legs loaded at once with their decayed T
+        # (and labels). The expired legs are left out, see expired.
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        c = self.columns
+        s = Strategy(str(c["ticker"][i]), str(c["currency"][i]),
+                     float(c["stocks"][i]), provider, service)
+        s.r = float(c["r"][i])
+        s.q = float(c["q"][i])
+        legs = self.legs(i)
+        T = legs["T"] - self.elapsed
+        live = T > 0
+        if not live.all():
+            print("{} expired legs not loaded".format(int((~live).sum())))
+        s.load_legs([_decayed_label(str(label), t) for label, t
+                     in zip(legs["label"][live], T[live])],
+                    {"amount": legs["amount"][live], "K": legs["K"][live],
+                     "T": T[live], "sigma": legs["sigma"][live],
+                     "is_call": legs["is_call"][live],
+                     "maturity_date": [m or None for m
+                                       in legs["maturity_date"][live]]})
+        return s
+
+
+def load_library(path, today=None):
+    return StrategyLibrary(path, today)
+
+
+def load_strategy(path, name=None, provider=None, service=None, today=None):
+    library = StrategyLibrary(path, today)
+    i = 0 if name is None else library.find(name)
+    if i == -1:
+        raise KeyError(name)
+    return library.strategy(i, provider, service)
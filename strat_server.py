@@ -1,15 +1,29 @@
 from bokeh.plotting import curdoc
-from bokeh.models.widgets import Button, Slider, Select, Spinner, Div
+from bokeh.models.widgets import Button, Slider, Select, Spinner, Div, Toggle
 from bokeh.layouts import column, row
 from OptionClass import Strategy
+from bokeh_view import StrategyView
+from market_service import get_service
+from scheduler import UpdateScheduler
+from spot_stream import PollingSpotSource, SpotStreamer
 from datetime import datetime
+import os
+import threading
+from storage import save_strategy
+from instrumentation import metrics, serve, timed
 
 # variables for stock
 exchange = "NYSE"
 ticker = "AAPL"
 stock_name = "Apple Inc."
 
-my_Strategy = Strategy()
+# market data is shared by all the sessions of the server, each session
+# keeping its own strategy
+service = get_service()
+service.subscribe(ticker)
+my_Strategy = Strategy(service=service)
+view = StrategyView(my_Strategy)
+my_Strategy.use_cube = True
 
 today = datetime.today()
 
@@ -80,20 +94,72 @@ slider_vol = Slider(start=-min_sigma * 100, end=30, value=0, step=0.1,
 
 slider_step = Slider(start=0, end=5, value=0.5, step=0.1, title="Window size")
 
-# update function
+# update functions
+
+# the strategy is recomputed in the scheduler's thread, its lock is held by
+# everything changing it
+strategy_lock = threading.RLock()
+
+
+def controls_state():
+    return {"rate": slider_rate.value / 100,
+            "shift_time": slider_time.value,
+            "shift_vol": slider_vol.value / 100,
+            "step": slider_step.value / 100,
+            "greek": select_greek.value,
+            "stocks": spinner_qty_stocks.value,
+            "legs": my_Strategy.positions.version,
+            "ticker": ticker,
+            "spot": my_Strategy.S_0}
+
+
+@timed("server.compute")
+def compute(state, changes):
+    # runs off the event loop: only the stages affected by the changes
+    with strategy_lock:
+        if "rate" in changes:
+            my_Strategy.r = state["rate"]
+            my_Strategy.refresh_spot()
+            my_Strategy.api.calibrate_chains(state["ticker"],
+                                             my_Strategy.S_0, my_Strategy.r,
+                                             my_Strategy.q, today)
+        my_Strategy.set_stock_quantity(state["stocks"])
+        if changes - {"greek"}:
+            my_Strategy.evaluate_grid(state["step"], state["shift_time"],
+                                      state["shift_vol"])
+
+
+@timed("server.apply")
+def apply(state, changes, result):
+    # runs on the event loop, the grid being already computed
+    global greek, shift_time, shift_vol, step
+    greek = state["greek"]
+    shift_time = state["shift_time"]
+    shift_vol = state["shift_vol"]
+    step = state["step"]
+    with strategy_lock:
+        if changes & {"rate", "legs", "ticker", "spot"}:
+            view.get_df_options()
+        view.get_df_pnl_greeks(greek, step, shift_time, shift_vol)
+    # change graphs
+    view.greeks_fig.title.text = greek
 
 
+@timed("server.update")
 def update():
     global ticker, exchange, menu_tickers
-    global info, greek, shift_time, shift_vol, step
+    global info
     global menu_maturities, menu_strikes, K, maturity
 
-    refresh_flag = False
-
     if menu_tickers[select_stock.value] != ticker:
         stock_name = select_stock.value
+        # the prefetch of the old ticker must not refill its chains
+        my_Strategy.api.cancel_prefetch()
+        service.release(ticker)
         ticker = menu_tickers[stock_name]
-        my_Strategy.reset(ticker)
+        service.subscribe(ticker)
+        with strategy_lock:
+            my_Strategy.reset(ticker)
         info.text = "The current value of <b>" + stock_name + "</b> is <b>{:.2f}</b>, the dividend yield\
             is <b>{:.2f}</b>%.".format(my_Strategy.S_0, my_Strategy.q * 100)
         if my_Strategy.api.get_maturities(ticker) == -1:
@@ -114,6 +180,7 @@ def update():
             menu_maturities = {mat: mat for mat in my_Strategy.api.
                                get_maturities(ticker)}
             maturity = list(menu_maturities.keys())[0]
+            my_Strategy.api.prefetch_chains(ticker, progress=show_prefetch)
 
             my_Strategy.api.get_options_data(ticker, option_type, maturity)
             menu_strikes = {str(k): k for k in my_Strategy.
@@ -132,46 +199,63 @@ def update():
         select_stock.options = list(menu_tickers.keys())
         select_stock.value = list(menu_tickers.keys())[0]
 
-    greek = select_greek.value
-    shift_time = slider_time.value
-    shift_vol = slider_vol.value / 100
-    step = slider_step.value / 100
+    scheduler.request(controls_state())
 
-    my_Strategy.set_stock_quantity(spinner_qty_stocks.value)
 
-    if my_Strategy.r != slider_rate.value:
-        my_Strategy.r = slider_rate.value/100
-        refresh_flag = True
+def show_spot(spot, aggregates):
+    # called from the spot streamer thread
+    def show():
+        live_info.text = "Live spot <b>{:.2f}</b>: value <b>{:.2f}</b>, delta\
+            <b>{:.2f}</b>, gamma <b>{:.4f}</b>".format(
+            spot, aggregates["BSprice"], aggregates["Delta"],
+            aggregates["Gamma"])
+        scheduler.request(controls_state())
+    bokeh_doc.add_next_tick_callback(show)
 
-    if refresh_flag:
-        my_Strategy.refresh()
 
-    my_Strategy.get_df_pnl_greeks(greek, step, shift_time, shift_vol)
-    # change graphs
-    my_Strategy.greeks_fig.title.text = greek
+@timed("server.toggle_stream")
+def toggle_stream(active):
+    # every tick moves the spot, which would restart the build of the
+    # scenario cube: grids are priced directly while streaming
+    global stream_callback
+    with strategy_lock:
+        my_Strategy.use_cube = not active
+    if active:
+        stream_callback = bokeh_doc.add_periodic_callback(
+            timed("server.stream_tick")(streamer.tick), stream_period)
+    elif stream_callback is not None:
+        bokeh_doc.remove_periodic_callback(stream_callback)
+        stream_callback = None
+
 
+def show_prefetch(done, total):
+    # called from the prefetch threads
+    def show():
+        chains_info.text = "Option chains loaded: {}/{}".format(done, total)
+    bokeh_doc.add_next_tick_callback(show)
 
+
+@timed("server.change_qty_option")
 def change_qty_option():
     global K, maturity, T, sigma, option_type, option_qty, min_T
     global min_sigma, slider_vol, slider_time
 
-    my_Strategy.r = slider_rate.value/100
     option_type = select_type.value
     maturity = select_maturity.value
     T = (datetime.strptime(maturity, "%Y-%m-%d") - today).days
     K = float(select_strike.value)
     option_qty = spinner_qty.value
-    sigma = my_Strategy.api.options_data[ticker].loc[
-        my_Strategy.api.options_data[ticker]
-        ["Strike"] == K, "Implied Volatility"].iloc[0]
-    my_Strategy.add_option(K, T, sigma, option_type, option_qty, maturity)
-    my_Strategy.refresh()
-
-    if my_Strategy.options_list != {}:
-        min_T = min(my_Strategy.options_list[o][1].T
-                    for o in my_Strategy.options_list)
-        min_sigma = min(my_Strategy.options_list[o][1].sigma
-                        for o in my_Strategy.options_list)
+    with strategy_lock:
+        my_Strategy.r = slider_rate.value/100
+        my_Strategy.api.calibrate_chains(ticker, my_Strategy.S_0,
+                                         my_Strategy.r, my_Strategy.q, today)
+        sigma = my_Strategy.api.implied_vol(ticker, maturity, option_type, K)
+        my_Strategy.add_option(K, T, sigma, option_type, option_qty, maturity)
+        my_Strategy.refresh()
+
+    if len(my_Strategy.positions):
+        min_T = my_Strategy.positions.T.min() / 365
+        min_sigma = my_Strategy.positions.sigma.min()
     else:
         min_T = 1
         min_sigma = 0
@@ -182,6 +266,7 @@ def change_qty_option():
     update()
 
 
+@timed("server.update_select_K")
 def update_select_K():
     global maturity, option_type, menu_strikes
     option_type = select_type.value
@@ -196,23 +281,39 @@ def update_select_K():
     select_strike.value = list(menu_strikes.keys())[0]
 
 
-controls = [select_exchange, select_stock, slider_rate, select_greek,
-            slider_vol, slider_time, slider_step, spinner_qty_stocks]
+controls_stock = [select_exchange, select_stock]
+controls = [slider_rate, select_greek, slider_vol, slider_time, slider_step,
+            spinner_qty_stocks]
 controls_opt = [select_maturity, select_type]
 
-for control in controls:
+for control in controls_stock:
     control.on_change('value', lambda attr, old, new: update())
 
+for control in controls:
+    control.on_change('value',
+                      lambda attr, old, new: scheduler.request(
+                          controls_state()))
+
 for control in controls_opt:
     control.on_change('value', lambda attr, old, new: update_select_K())
 
 button_add.on_click(change_qty_option)
 
+# live spot: polled every stream_period milliseconds while the toggle is on
+stream_period = 2000
+stream_callback = None
+streamer = SpotStreamer(my_Strategy, PollingSpotSource(my_Strategy.api),
+                        show_spot, latency_budget=0.5, lock=strategy_lock)
+toggle_live = Toggle(label="Live spot", active=False)
+toggle_live.on_click(toggle_stream)
+
 info = Div(text="The current value of <b>{}</b> is <b>{:.2f}</b>,\
            the dividend yield is <b>{:.2f}</b>%".format(stock_name,
            my_Strategy.S_0, my_Strategy.q * 100))
 data = Div(text="There is available options data for <b>{}</b> on yahoo"
            .format(stock_name), style={'color': 'green'})
+chains_info = Div(text="")
+live_info = Div(text="")
 your_pf = Div(text="<b>These are the options in your portfolio</b>",
               align="center")
 welcome = Div(text=" Welcome to this option strategy builder \
@@ -229,13 +330,32 @@ welcome = Div(text=" Welcome to this option strategy builder \
               " " + "&nbsp"*60 + "<em>by Elyès Chenik, Yoni Hassine\
             and Baptiste Souilhac</em>", margin=(0, 0, 100, 0), align="start")
 
-my_Strategy.get_df_pnl_greeks(greek, step, shift_time, shift_vol)
-my_Strategy.create_figures(greek)
+view.get_df_pnl_greeks(greek, step, shift_time, shift_vol)
+view.create_figures(greek)
 
 bokeh_doc = curdoc()
 
+
+def session_destroyed(session_context):
+    my_Strategy.api.cancel_prefetch()
+    service.release(ticker)
+    # OPC_SAVE_DIR=<dir> keeps the strategy of each closed session
+    save_dir = os.environ.get("OPC_SAVE_DIR")
+    if save_dir and len(my_Strategy.positions):
+        save_strategy(my_Strategy, os.path.join(save_dir, "{}-{}".format(
+            ticker, datetime.now().strftime("%Y%m%d-%H%M%S-%f"))), ticker)
+
+
+bokeh_doc.on_session_destroyed(session_destroyed)
+scheduler = UpdateScheduler(bokeh_doc, compute, apply)
+scheduler.applied = controls_state()
+my_Strategy.api.prefetch_chains(ticker, progress=show_prefetch)
+
 bokeh_doc.add_root(row(column(info,
                               data,
+                              chains_info,
+                              toggle_live,
+                              live_info,
                               column(select_exchange,
                                      select_stock,
                                      slider_rate,
@@ -254,15 +374,30 @@ bokeh_doc.add_root(row(column(info,
                               background="aliceblue"),
                        column(row(column(welcome,
                                          your_pf,
-                                         my_Strategy.options_table,
+                                         view.options_table,
                                          align="center",
                                          background="white"),
-                                  column(my_Strategy.pnl_fig,
-                                         my_Strategy.pnl_table,
+                                  column(view.pnl_fig,
+                                         view.pnl_table,
                                          sizing_mode="scale_width"),
-                                  column(my_Strategy.greeks_fig,
-                                         my_Strategy.greeks_table,
+                                  column(view.greeks_fig,
+                                         view.greeks_table,
                                          sizing_mode="scale_width"),
                                   sizing_mode="scale_height"),
                               align="center"), background="white"))
 bokeh_doc.title = "Options strategy builder"
+
+# OPC_METRICS=1 shows the timings of the hot paths in a panel refreshed
+# every metrics_period milliseconds, OPC_METRICS_PORT=<port> also serves
+# them at /metrics (Prometheus text) and /metrics.json
+metrics_period = 2000
+if metrics.enabled:
+    metrics_panel = Div(text=metrics.html())
+
+    def show_metrics():
+        metrics_panel.text = metrics.html()
+
+    bokeh_doc.add_periodic_callback(show_metrics, metrics_period)
+    bokeh_doc.add_root(metrics_panel)
+    if os.environ.get("OPC_METRICS_PORT"):
+        serve(int(os.environ["OPC_METRICS_PORT"]))
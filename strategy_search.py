@@ -0,0 +1,301 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+from scipy.special import ndtr
+from pricing import PRICE_GREEKS, bs_price_greeks
+
+# quantities (leg pattern) of each family, the opposite structure being
+# searched as well
+families = {"vertical": [1, -1], "straddle": [1, 1], "strangle": [1, 1],
+            "butterfly": [1, -2, 1], "condor": [1, -1, -1, 1],
+            "calendar": [-1, 1]}
+
+
+def _score(metrics, objective):
+    # the higher the better
+    if callable(objective):
+        return objective(metrics)
+    if objective == "reward_risk":
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = metrics["max_profit"] / -metrics["max_loss"]
+        return np.where(metrics["max_loss"] >= 0, np.inf, out)
+    if objective == "cost":
+        return -metrics["cost"]
+    if objective == "max_loss":
+        return metrics["max_loss"]
+    return metrics[objective]
+
+
+def _evaluate(table, grid, idx, qty, horizon, objective, max_cost, max_risk,
+              top, r, vol):
+    # metrics of the combinations idx (legs as rows of table) of one chunk,
+    # all ending at the same horizon (in days). Returns the best top of them.
+    qty = np.broadcast_to(qty, idx.shape)
+    cost = (qty * table["price"][idx]).sum(axis=1)
+    metrics = {name: (qty * table[name][idx]).sum(axis=1)
+               for name in PRICE_GREEKS[1:]}
+    metrics["cost"] = cost
+
+    # value of the used contracts on the spot grid at the horizon: payoff of
+    # the ones expiring, Black-Scholes value of the others
+    used, rows = np.unique(idx, return_inverse=True)
+    rows = rows.reshape(idx.shape)
+    T = table["T"][used, None] - horizon
+    is_call = table["is_call"][used, None]
+    payoff = np.where(is_call, np.maximum(grid - table["K"][used, None], 0),
+                      np.maximum(table["K"][used, None] - grid, 0))
+    later = bs_price_greeks(grid, table["K"][used, None], np.maximum(T, 1e-9),
+                            table["sigma"][used, None], r,
+                            is_call)["BSprice"]
+    values = np.where(T > 0, later, payoff)
+    # the quantities are the same for every combination of the chunk
+    pnl = np.take(qty[0, 0] * values, rows[:, 0], axis=0)
+    for leg in range(1, idx.shape[1]):
+        pnl += np.take(qty[0, leg] * values, rows[:, leg], axis=0)
+    pnl -= cost[:, None]
+
+    metrics["max_profit"] = pnl.max(axis=1)
+    metrics["max_loss"] = pnl.min(axis=1)
+    # beyond the last grid point the pnl keeps its last slope
+    slope = pnl[:, -1] - pnl[:, -2]
+    metrics["max_profit"][slope > 1e-9] = np.inf
+    metrics["max_loss"][slope < -1e-9] = -np.inf
+    # probability of profit and expected pnl, spot lognormal at the horizon
+    s = vol * np.sqrt(max(horizon, 1e-9) / 365)
+    with np.errstate(divide='ignore'):
+        edges = np.log(np.concatenate([[grid[0]], (grid[1:] + grid[:-1]) / 2,
+                                       [np.inf]]) / table["S_0"])
+        cdf = ndtr((edges - (r - 0.5 * vol**2) * horizon / 365) / s)
+    weights = np.diff(cdf)
+    weights[0] += cdf[0]
+    metrics["pop"] = (pnl > 0) @ weights
+    metrics["expected_pnl"] = pnl @ weights
+
+    keep = np.ones(len(idx), dtype=bool)
+    if max_cost is not None:
+        keep &= cost <= max_cost
+    if max_risk is not None:
+        keep &= metrics["max_loss"] >= -max_risk
+    score = np.where(keep, _score(metrics, objective), -np.inf)
+    score = np.where(np.isnan(score), -np.inf, score)
+    best = np.argsort(-score, kind="stable")[:top]
+    best = best[score[best] > -np.inf]
+    out = {name: values[best] for name, values in metrics.items()}
+    out.update(score=score[best], idx=idx[best], qty=qty[best],
+               pnl=pnl[best], horizon=np.full(len(best), float(horizon)))
+    return out
+
+
+def _evaluate_chunk(args):
+    return _evaluate(*args)
+
+
+def _merge(best, res, top):
+    if best is None:
+        return res
+    both = {k: np.concatenate([best[k], res[k]]) for k in best}
+    order = np.argsort(-both["score"], kind="stable")[:top]
+    return {k: v[order] for k, v in both.items()}
+
+
+def _breakevens(grid, pnl):
+    # spots where the pnl changes sign, linearly interpolated
+    sign = np.sign(pnl)
+    out = []
+    for i in np.flatnonzero(sign[:-1] * sign[1:] < 0):
+        out.append(float(grid[i] - pnl[i] * (grid[i + 1] - grid[i])
+                         / (pnl[i + 1] - pnl[i])))
+    return out
+
+
+class StrategySearch:
+    # search of the best structures of a family among the loaded chains of a
+    # ticker (ChainStore, see chain_store.py). Every combination of listed
+    # strikes is evaluated in chunks of chunk_size, optionally spread over
+    # processes, keeping only the best ones. Contracts are priced at their
+    # mid (last price without quote) and their implied volatility.
+    #   moneyness: only strikes within S_0 * (1 +/- moneyness) are used
+    #   max_width: largest distance between the strikes of a structure
+
+    def __init__(self, store, ticker, S_0, r=0, today=None, moneyness=None,
+                 max_width=None, chunk_size=10000, processes=None):
+        self.S_0 = S_0
+        self.r = r
+        self.max_width = max_width if max_width is not None else np.inf
+        self.chunk_size = chunk_size
+        self.processes = processes
+        today = today or datetime.today()
+        cols = {"K": [], "T": [], "sigma": [], "is_call": [], "price": [],
+                "maturity": []}
+        # rows of the table for each (maturity, type), sorted by strike
+        self.chains = {}
+        n = 0
+        for (t, maturity, option_type), chain in sorted(store.items(ticker),
+                                                        key=lambda x: x[0]):
+            T = (datetime.strptime(maturity, "%Y-%m-%d") - today).days
+            price = chain.last_prices
+            if chain.mids is not None:
+                price = np.where(np.isnan(chain.mids), price, chain.mids)
+            keep = (price > 0) & (chain.implied_vols > 0)
+            if moneyness is not None:
+                keep &= np.abs(chain.strikes / S_0 - 1) <= moneyness
+            if t != ticker or T <= 0 or not keep.any():
+                continue
+            m = int(keep.sum())
+            cols["K"].append(chain.strikes[keep])
+            cols["T"].append(np.full(m, float(T)))
+            cols["sigma"].append(chain.implied_vols[keep])
+            cols["is_call"].append(np.full(m, option_type == "Call"))
+            cols["price"].append(price[keep])
+            cols["maturity"].append(np.full(m, maturity, dtype=object))
+            self.chains[(maturity, option_type)] = np.arange(n, n + m)
+            n += m
+        self.table = {k: np.concatenate(v) if v else np.array([])
+                      for k, v in cols.items()}
+        self.table["S_0"] = S_0
+        self.table.update(bs_price_greeks(S_0, self.table["K"],
+                                          self.table["T"],
+                                          self.table["sigma"], r,
+                                          self.table["is_call"].astype(bool)))
+        self.maturities = sorted({m for m, o in self.chains})
+        # spot grid: every strike, where the payoffs have their kinks, and
+        # points around the spot for the probabilities
+        K = self.table["K"]
+        top = 3 * max(K.max() if len(K) else S_0, S_0)
+        self.grid = np.unique(np.concatenate([
+            K, np.linspace(0, top, 31), np.linspace(0.5, 1.5, 101) * S_0]))
+
+    def _pairs(self, a, b, ordered=True):
+        # (row of a, row of b) with K_a < K_b (<= when not ordered) and
+        # within max_width
+        K = self.table["K"]
+        i, j = np.meshgrid(a, b, indexing="ij")
+        i, j = i.ravel(), j.ravel()
+        width = K[j] - K[i]
+        ok = (width > 0 if ordered else width >= 0) & (width <= self.max_width)
+        return np.stack([i[ok], j[ok]], axis=1)
+
+    def combinations(self, family):
+        # chunks (legs, horizon) of the combinations of a family, legs being
+        # an array (combinations x legs) of rows of the table
+        if family not in families:
+            raise ValueError("unknown family " + str(family))
+        K = self.table["K"]
+        for m in self.maturities:
+            T = self.table["T"][self.chains.get((m, "Call"), self.chains.get(
+                (m, "Put")))[0]]
+            calls = self.chains.get((m, "Call"), np.array([], dtype=int))
+            puts = self.chains.get((m, "Put"), np.array([], dtype=int))
+            if family == "vertical":
+                for rows in (calls, puts):
+                    yield self._pairs(rows, rows), T
+            elif family == "straddle":
+                pairs = self._pairs(puts, calls, ordered=False)
+                yield pairs[K[pairs[:, 0]] == K[pairs[:, 1]]], T
+            elif family == "strangle":
+                yield self._pairs(puts, calls), T
+            elif family == "butterfly":
+                for rows in (calls, puts):
+                    if len(rows) < 3:
+                        continue
+                    pairs = self._pairs(rows, rows)
+                    target = 2 * K[pairs[:, 1]] - K[pairs[:, 0]]
+                    k = np.searchsorted(K[rows], target)
+                    k = np.minimum(k, len(rows) - 1)
+                    ok = np.isclose(K[rows][k], target)\
+                        & (target - K[pairs[:, 0]] <= self.max_width)
+                    yield np.column_stack([pairs[ok], rows[k[ok]]]), T
+            elif family == "condor":
+                # iron condor: put spread below a call spread
+                put_pairs = self._pairs(puts, puts)
+                call_pairs = self._pairs(calls, calls)
+                batch = []
+                size = 0
+                for a, b in put_pairs:
+                    ok = (K[call_pairs[:, 0]] >= K[b])\
+                        & (K[call_pairs[:, 1]] - K[a] <= self.max_width)
+                    if ok.any():
+                        c = call_pairs[ok]
+                        batch.append(np.column_stack([
+                            np.full(len(c), a), np.full(len(c), b), c]))
+                        size += len(c)
+                    if size >= self.chunk_size:
+                        yield np.concatenate(batch), T
+                        batch = []
+                        size = 0
+                if batch:
+                    yield np.concatenate(batch), T
+            elif family == "calendar":
+                # sold at m, bought at a later maturity, same strike and type
+                for far in self.maturities:
+                    if far <= m:
+                        continue
+                    for option_type in ("Call", "Put"):
+                        near_rows = self.chains.get((m, option_type))
+                        far_rows = self.chains.get((far, option_type))
+                        if near_rows is None or far_rows is None:
+                            continue
+                        common, i, j = np.intersect1d(
+                            K[near_rows], K[far_rows], return_indices=True)
+                        yield np.column_stack([near_rows[i],
+                                               far_rows[j]]), T
+
+    def _chunks(self, family):
+        # chunks of at most chunk_size combinations, each structure being
+        # searched bought and sold
+        for legs, horizon in self.combinations(family):
+            for start in range(0, len(legs), self.chunk_size):
+                part = legs[start:start + self.chunk_size]
+                for sign in (1, -1):
+                    yield part, sign * np.array(families[family]), horizon
+
+    def search(self, family, objective="reward_risk", top=10, max_cost=None,
+               max_risk=None, vol=None):
+        # best top structures of the family by objective: "reward_risk",
+        # "pop" (probability of profit), "expected_pnl", "max_profit",
+        # "max_loss", "cost" (the cheapest), a greek name, or a function of
+        # the dict of metrics returning a score (the higher the better).
+        # Probabilities use a lognormal spot of volatility vol (default:
+        # median implied volatility of the chains).
+        # max_cost and max_risk (largest acceptable loss) prune the results.
+        if vol is None:
+            vol = float(np.median(self.table["sigma"])) if len(
+                self.table["sigma"]) else 0.3
+        self.evaluated = 0
+
+        def args():
+            for legs, qty, horizon in self._chunks(family):
+                if len(legs):
+                    self.evaluated += len(legs)
+                    yield (self.table, self.grid, legs, qty, horizon,
+                           objective, max_cost, max_risk, top, self.r, vol)
+        best = None
+        if self.processes and self.processes > 1:
+            with ProcessPoolExecutor(self.processes) as pool:
+                for res in pool.map(_evaluate_chunk, args()):
+                    best = _merge(best, res, top)
+        else:
+            for res in map(_evaluate_chunk, args()):
+                best = _merge(best, res, top)
+        if best is None:
+            return []
+        return [self._result(family, best, i) for i in range(len(best["idx"]))]
+
+    def _result(self, family, best, i):
+        t = self.table
+        legs = [(float(t["K"][j]), int(t["T"][j]), float(t["sigma"][j]),
+                 "Call" if t["is_call"][j] else "Put", int(q),
+                 t["maturity"][j])
+                for j, q in zip(best["idx"][i], best["qty"][i])]
+        out = {"family": family, "legs": legs,
+               "breakevens": _breakevens(self.grid, best["pnl"][i])}
+        out.update({k: float(v[i]) for k, v in best.items()
+                    if k not in ("idx", "qty", "pnl")})
+        return out
+
+
+def add_to_strategy(strategy, result, quantity=1):
+    # adds the legs of a search result to a Strategy
+    for K, T, sigma, option_type, amount, maturity in result["legs"]:
+        strategy.add_option(K, T, sigma, option_type, amount * quantity,
+                            maturity)
@@ -6,6 +6,7 @@ Created on Wed Jan 13 16:03:22 2021
 """
 
 from OptionClass import Option, Strategy
+from providers import SnapshotProvider
 # Test of the option price and greeks for 2 different options
 
 my_option1 = Option(1900, 1900, 30, 0.15, 0, 0, "Call")
@@ -37,12 +38,30 @@ def test_OptionClass_theta():
     assert round(my_option2.Theta, 4) == -0.0588
 
 
+def test_OptionClass_refresh():
+    my_option = Option(1900, 1900, 30, 0.15, 0, 0, "Call")
+    assert round(my_option.BSprice, 3) == 32.594
+    my_option.S_0 = 450
+    my_option.K = 495
+    my_option.T = 60 / 365
+    my_option.sigma = 0.22
+    my_option.r = 0.02
+    my_option.option_type = "Put"
+    assert round(my_option.BSprice, 3) == 46.669
+
+
 # Test of price and greeks of a strategy corresponding to a Long Butterfly
 
-my_Strategy = Strategy()
-my_Strategy.add_option(1880, 30, 0.16, 0, "Call", 10)
-my_Strategy.add_option(1900, 30, 0.16, 0, "Call", -20)
-my_Strategy.add_option(1920, 30, 0.16, 0, "Call", 10)
+# Market data is replayed from a snapshot, so no connection is needed
+snapshot = SnapshotProvider({"info": {"AAPL": {"currency": "USD",
+                                               "bid": 1900, "ask": 1900,
+                                               "previousClose": 1900,
+                                               "dividendYield": 0}},
+                             "fx": {("USD", "EUR"): 0.82}})
+my_Strategy = Strategy(provider=snapshot)
+my_Strategy.add_option(1880, 30, 0.16, "Call", 10)
+my_Strategy.add_option(1900, 30, 0.16, "Call", -20)
+my_Strategy.add_option(1920, 30, 0.16, "Call", 10)
 
 
 def test_StrategyClass_Price():
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from backtest import backtest, load_history
+from fixtures import make_strategy
+
+dates = pd.bdate_range("2021-01-04", periods=60)
+spots = 130 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01,
+                                                              len(dates))))
+
+
+def test_load_history(tmp_path):
+    path = tmp_path / "AAPL.csv"
+    pd.DataFrame({"Date": dates.strftime("%Y-%m-%d"), "Close": spots})\
+        .iloc[::-1].to_csv(path, index=False)
+    closes = load_history(str(path), start="2021-01-05")
+    assert closes.index[0] == pd.Timestamp("2021-01-05")
+    assert np.allclose(closes.to_numpy(), spots[1:])
+
+
+def test_load_history_timezone():
+    # yahoo histories are indexed in the exchange timezone
+    class Provider:
+        def history(self, ticker, start, end):
+            return pd.Series(spots, index=dates.tz_localize(
+                "America/New_York"))
+
+    closes = load_history(Provider(), "AAPL", "2021-01-05", "2021-01-08")
+    assert closes.index.tz is None
+    assert list(closes.index) == list(dates[1:5])
+
+
+def test_backtest():
+    strategy = make_strategy(10)
+    strategy.set_stock_quantity(-5)
+    closes = pd.Series(spots, index=dates)
+    res = backtest(strategy, closes, chunk_size=7)
+    assert np.allclose(res.to_numpy(float),
+                       backtest(strategy, closes).to_numpy(float))
+    assert np.isclose(res["Value"].iloc[0], strategy.price(spots[0]))
+    assert res["P&L"].iloc[0] == 0
+    # every leg expires after 30 days, settled at the close of that day
+    assert res["Legs"].iloc[-1] == 0 and res["Legs"].iloc[0] == 10
+    expired = res[res["Legs"] == 0]
+    assert np.allclose(np.diff(expired["Value"]),
+                       -5 * np.diff(expired["Spot"]))
+    # the greeks explain most of the daily P&L while the legs are alive
+    alive = res[res["Legs"] == 10].iloc[1:]
+    assert alive["Residual"].abs().sum() < 0.1 * alive["Delta P&L"].abs().sum()
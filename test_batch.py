@@ -0,0 +1,35 @@
+import csv
+import json
+import subprocess
+import sys
+from batch import main
+from fixtures import stub_market
+from providers import SnapshotProvider
+
+definitions = [{"name": "spread", "ticker": "AAPL", "r": 0.01,
+                "legs": [{"K": 120, "T": 30, "sigma": 0.25,
+                          "option_type": "Call", "amount": 1},
+                         {"K": 140, "T": 30, "sigma": 0.25,
+                          "option_type": "Call", "amount": -1}]},
+               {"name": "missing", "ticker": "MSFT"}]
+
+
+def test_batch_cli(tmp_path):
+    SnapshotProvider(stub_market).save(str(tmp_path / "market"))
+    path = tmp_path / "strategies.jsonl"
+    path.write_text("\n".join(json.dumps(d) for d in definitions))
+    out = tmp_path / "out.csv"
+    assert main([str(path), "--snapshot", str(tmp_path / "market"),
+                 "--output", str(out), "--shift-time", "5"]) == 1
+    rows = list(csv.DictReader(open(out)))
+    assert rows[0]["name"] == "spread" and rows[0]["legs"] == "2"
+    assert 0 < float(rows[0]["BSprice"]) < 20 and rows[0]["error"] == ""
+    assert rows[1]["error"].startswith("KeyError")
+
+
+def test_headless_import():
+    # the core does not import Bokeh
+    code = "import sys, batch; print('bokeh' in sys.modules)"
+    res = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                         text=True)
+    assert res.stdout.strip() == "False"
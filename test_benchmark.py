@@ -0,0 +1,9 @@
+from benchmark import compare, run
+
+
+def test_benchmark_run_and_compare():
+    res = run(min_time=0, leg_counts=(2,), grid_sizes=(10,))
+    assert "get_df_pnl_greeks 2 legs 10 points" in res["results"]
+    slower = dict(res, results={k: 2 * t for k, t in res["results"].items()})
+    assert compare(res, res) == {}
+    assert set(compare(res, slower, threshold=0.5)) == set(res["results"])
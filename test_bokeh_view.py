@@ -0,0 +1,15 @@
+from bokeh_view import StrategyView
+from fixtures import make_strategy
+
+
+def test_StrategyView():
+    strategy = make_strategy(3)
+    view = StrategyView(strategy)
+    view.get_df_options()
+    view.get_df_pnl_greeks("Gamma", 0.005, 5, 0.01)
+    assert list(view.cds_options.data["Strike"]) == [100, 101, 102]
+    assert len(view.cds_pnl.data["Forward"]) == len(strategy.df_pnl)
+    assert [c.title for c in view.greeks_table.columns] ==\
+        list(strategy.df_greeks.columns)
+    view.create_figures("Gamma")
+    assert view.greeks_fig.title.text == "Gamma"
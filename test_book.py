@@ -0,0 +1,59 @@
+import numpy as np
+from book import Book
+from OptionClass import Strategy
+from providers import SnapshotProvider
+
+market = SnapshotProvider({"info": {
+    "AAPL": {"currency": "USD", "bid": 130, "ask": 130, "previousClose": 130,
+             "dividendYield": 0},
+    "SAP": {"currency": "EUR", "bid": 100, "ask": 100, "previousClose": 100,
+            "dividendYield": 0}}, "fx": {("USD", "EUR"): 0.8}})
+
+
+def make_book():
+    book = Book("EUR")
+    for ticker in ("AAPL", "SAP", "AAPL"):
+        name = book.add_strategy(Strategy(ticker, provider=market))
+        book.add_option(name, 100, 30, 0.2, "Call", 2)
+        book.add_option(name, 110, 60, 0.3, "Put", -1)
+    return book
+
+
+def test_Book_aggregates():
+    book = make_book()
+    assert list(book.strategies) == ["AAPL", "SAP", "AAPL 2"]
+    aapl = book.strategies["AAPL"]
+    assert np.isclose(book.underlying("AAPL")["Delta"], 2 * aapl.Delta())
+    sap = book.strategies["SAP"]
+    total = book.totals()
+    assert np.isclose(total["BSprice"],
+                      2 * aapl.price() * 0.8 + sap.price())
+    assert np.isclose(total["Delta"],
+                      2 * aapl.Delta() * 130 * 0.8 + sap.Delta() * 100)
+
+
+def test_Book_incremental_updates():
+    book = make_book()
+    book.add_option("SAP", 100, 30, 0.2, "Call", -2)
+    book.set_stock_quantity("SAP", 5)
+    book.update_spot("AAPL", 140)
+    for ticker in book.tickers:
+        expected = sum(s.aggregates()["BSprice"]
+                       for s in book.strategies.values()
+                       if s.ticker == ticker)
+        assert np.isclose(book.underlying(ticker)["BSprice"], expected)
+    # changed outside of the book
+    book.strategies["SAP"].add_option(90, 30, 0.2, "Put", 1)
+    assert np.isclose(book.underlying("SAP")["BSprice"],
+                      book.strategies["SAP"].price())
+    book.remove_strategy("SAP")
+    assert list(book.report().index) == ["AAPL"]
+
+
+def test_Book_existing_leg_keeps_its_sigma():
+    book = Book("EUR")
+    name = book.add_strategy(Strategy("AAPL", provider=market))
+    book.add_option(name, 130, 30, 0.2, "Call", 10)
+    book.add_option(name, 130, 30, 0.35, "Call", 10)
+    assert np.isclose(book.underlying("AAPL")["BSprice"],
+                      book.strategies[name].price())
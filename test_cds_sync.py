@@ -0,0 +1,19 @@
+import numpy as np
+from bokeh.models import ColumnDataSource
+from cds_sync import sync_source
+
+
+def test_sync_source():
+    cds = ColumnDataSource()
+    x = np.arange(5.)
+    assert sync_source(cds, {"x": x, "y": x ** 2}) == "replace"
+    assert sync_source(cds, {"x": x, "y": x ** 2}) is None
+    y = x ** 2
+    y[2:4] = np.nan
+    assert sync_source(cds, {"x": x, "y": y}) == "patch"
+    assert sync_source(cds, {"x": x, "y": y}) is None
+    assert sync_source(cds, {"x": np.arange(7.), "y": np.append(y, [1, 2])})\
+        == "stream"
+    assert np.array_equal(cds.data["y"], np.append(y, [1, 2]),
+                          equal_nan=True)
+    assert sync_source(cds, {"x": x, "y": x}) == "replace"
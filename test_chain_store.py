@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from chain_store import ChainStore
+from pricing import bs_price_greeks
+
+frame = pd.DataFrame({"Strike": [130, 110, 120, 140],
+                      "Last Price": [2.5, 15.1, 7.0, 0.8],
+                      "Implied Volatility": [0.25, 0.31, 0.27, 0.24]})
+
+
+def test_ChainStore_lookup():
+    store = ChainStore()
+    chain = store.put("AAPL", "2021-04-16", "Call", frame)
+    assert list(chain.strikes) == [110, 120, 130, 140]
+    assert store.implied_vol("AAPL", "2021-04-16", "Call", 130) == 0.25
+    assert store.implied_vol("AAPL", "2021-04-16", "Call", 131) is None
+    assert store.implied_vol("AAPL", "2021-04-16", "Put", 130) is None
+    assert chain.implied_vol(124, nearest=True) == 0.27
+    assert chain.last_price(1000, nearest=True) == 0.8
+    assert chain.nearest(0) == 0
+
+
+def test_ChainStore_calibrate():
+    store = ChainStore()
+    prices = bs_price_greeks(125, [130, 110, 120, 140], 30, 0.3, 0.01,
+                             True)["BSprice"]
+    raw = frame.assign(**{"Last Price": prices}, bid=prices - 0.01,
+                       ask=prices + 0.01)
+    chain = store.put("AAPL", "2021-04-16", "Call", raw.copy(), raw)
+    chain.last_prices[0] = 0
+    out = store.calibrate("AAPL", 125, 0.01,
+                          today=pd.Timestamp("2021-03-17"))
+    vols, converged = out[("2021-04-16", "Call")]
+    assert converged.all() and np.allclose(vols, 0.3)
+    assert chain.implied_vol(120, vols=vols) == vols[1]
+    # the shared chain keeps the volatilities of the feed
+    assert chain.implied_vols[1] == 0.27
+
+
+def test_ChainStore_released_ticker():
+    store = ChainStore()
+    store.put("AAPL", "2021-04-16", "Call", frame)
+    store.clear("AAPL")
+    # a chain loaded late for a released ticker is not kept
+    chain = store.put("AAPL", "2021-04-16", "Call", frame)
+    assert len(chain) == 4 and len(store) == 0
+    store.reopen("AAPL")
+    store.put("AAPL", "2021-04-16", "Call", frame)
+    assert len(store) == 1
@@ -0,0 +1,14 @@
+import json
+import numpy as np
+from fx_rates import FXCache
+
+
+def test_FXCache_local_rates(tmp_path):
+    path = tmp_path / "rates.json"
+    path.write_text(json.dumps({"USD/EUR": 0.8}))
+    fx = FXCache(rates_file=str(path))
+    assert np.allclose(fx.convert("USD", "EUR", np.array([10, 20.])), [8, 16])
+    assert fx.convert("EUR", "USD", 8) == 10
+    assert fx.convert("EUR", "EUR", 5) == 5
+    fx.convert("USD", "EUR", 1)
+    assert fx.rates.hits == 1
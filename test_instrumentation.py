@@ -0,0 +1,68 @@
+import json
+import urllib.request
+import pytest
+from fixtures import make_strategy
+from instrumentation import metrics, serve, span, timed
+
+
+@pytest.fixture
+def enabled():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.enable(False)
+    metrics.reset()
+
+
+def test_disabled_records_nothing():
+    metrics.reset()
+    assert not metrics.enabled
+    assert timed("f")(lambda x: x + 1)(1) == 2
+    with span("block"):
+        pass
+    metrics.count("events")
+    assert metrics.snapshot() == {"spans": {}, "counters": {}}
+
+
+def test_strategy_spans_and_counters(enabled):
+    strategy = make_strategy(10)
+    strategy.get_df_pnl(0.005, 5, 0.01)
+    strategy.get_df_greeks("Delta", 0.005, 5, 0.01)
+    strategy.options_list
+    snap = enabled.snapshot()
+    spans = snap["spans"]
+    assert spans["Strategy.get_df_pnl"]["count"] == 1
+    # the grid of get_df_greeks is the cached one
+    assert spans["Strategy.evaluate_grid"]["count"] == 2
+    assert spans["finance_api.get_info"]["count"] >= 1
+    stats = spans["Strategy.evaluate_grid"]
+    assert 0 < stats["p50"] <= stats["p90"] <= stats["p99"] <= stats["max"]
+    assert snap["counters"]["Option.constructions"] == 10
+    assert snap["counters"]["cache.info.misses"] == 1
+    assert snap["counters"]["cache.info.hits"] >= 1
+
+
+def test_rolling_window_and_exports(enabled):
+    for i in range(2000):
+        enabled.record("stage", 1. if i < 1000 else 2.)
+    stats = enabled.summary()["stage"]
+    # the percentiles only see the last window calls, the mean all of them
+    assert stats["count"] == 2000 and stats["mean"] == 1.5
+    assert stats["p50"] == stats["p99"] == 2.
+    enabled.count("events", 3)
+    assert json.loads(enabled.to_json())["counters"] == {"events": 3}
+    text = enabled.to_prometheus()
+    assert 'opc_span_seconds{span="stage",quantile="0.9"} 2.0' in text
+    assert 'opc_span_seconds_count{span="stage"} 2000' in text
+    assert 'opc_events_total{name="events"} 3' in text
+    assert "<td>stage</td><td>2000</td>" in enabled.html()
+
+
+def test_http_endpoint(enabled):
+    enabled.count("events")
+    server = serve(0)
+    url = "http://127.0.0.1:{}".format(server.server_address[1])
+    text = urllib.request.urlopen(url + "/metrics").read().decode()
+    assert 'opc_events_total{name="events"} 1' in text
+    snap = json.loads(urllib.request.urlopen(url + "/metrics.json").read())
+    assert snap["counters"] == {"events": 1}
@@ -0,0 +1,45 @@
+import threading
+import time
+from market_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_TTLCache_expiry_and_lru():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, maxsize=2, clock=clock)
+    assert cache.get_or_fetch("a", lambda: 1) == 1
+    assert cache.get_or_fetch("a", lambda: 2) == 1
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    clock.now = 11
+    assert cache.get_or_fetch("a", lambda: 4) == 4
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_TTLCache_single_flight():
+    cache = TTLCache(ttl=10)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return "AAPL info"
+
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(cache.get_or_fetch("AAPL", fetch)))
+        for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == ["AAPL info"] * 8
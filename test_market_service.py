@@ -0,0 +1,31 @@
+from OptionClass import Strategy
+from market_service import MarketService
+from providers import SnapshotProvider
+
+
+class CountingProvider(SnapshotProvider):
+    def __init__(self, data):
+        super().__init__(data)
+        self.requests = 0
+
+    def info(self, ticker):
+        self.requests += 1
+        return super().info(ticker)
+
+
+def test_MarketService_shared_by_sessions():
+    provider = CountingProvider({"info": {"AAPL": {
+        "currency": "USD", "bid": 130, "ask": 130, "previousClose": 130,
+        "dividendYield": 0}}, "fx": {("USD", "EUR"): 0.82}})
+    service = MarketService(provider)
+    sessions = []
+    for i in range(5):
+        service.subscribe("AAPL")
+        sessions.append(Strategy(service=service))
+    sessions[0].add_option(130, 30, 0.2, "Call", 1)
+    assert provider.requests == 1 and len(sessions[1].positions) == 0
+    for s in sessions:
+        service.release("AAPL")
+    assert service.subscribers == {}
+    Strategy(service=service)
+    assert provider.requests == 2
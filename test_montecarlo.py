@@ -0,0 +1,46 @@
+import numpy as np
+from fixtures import make_strategy
+from montecarlo import asian_payoff, mc_price
+from pricing import bs_price_greeks
+from OptionClass import Option
+
+K = np.array([90, 100, 110.])
+T = np.array([30, 60, 90.])
+sigma = np.array([0.2, 0.25, 0.3])
+is_call = np.array([True, False, True])
+
+
+def test_mc_price():
+    price, std_error = mc_price(100, K, T, sigma, 0.02, is_call,
+                                n_paths=200000, seed=0)
+    expected = bs_price_greeks(100, K, T, sigma, 0.02, is_call)["BSprice"]
+    assert np.all(np.abs(price - expected) < 5 * std_error)
+    # the variance reduction beats plain sampling
+    plain = mc_price(100, K, T, sigma, 0.02, is_call, n_paths=200000,
+                     seed=0, antithetic=False, control_variate=False)[1]
+    assert np.all(std_error < plain / 2)
+
+
+def test_mc_price_processes():
+    args = (100, K, T, sigma, 0.02, is_call)
+    one = mc_price(*args, n_paths=20000, seed=1, processes=2)
+    two = mc_price(*args, n_paths=20000, seed=1, processes=2)
+    assert np.array_equal(one[0], two[0])
+
+
+def test_mc_price_path_dependent():
+    asian = mc_price(100, K, T, sigma, 0.02, is_call, n_paths=20000, seed=2,
+                     payoff=asian_payoff, n_steps=10, batch_size=2000)[0]
+    european = bs_price_greeks(100, K, T, sigma, 0.02, is_call)["BSprice"]
+    assert np.all(asian < european)
+
+
+def test_monte_carlo_strategy():
+    opt = Option(130, 120, 30, 0.2, 0.002, 0, "Call")
+    price, std_error = opt.monte_carlo(n_paths=50000, seed=3)
+    assert opt.MCprice == price and abs(price - opt.BSprice) < 5 * std_error
+    strategy = make_strategy(10)
+    res = strategy.monte_carlo(n_paths=50000, seed=3)
+    assert abs(res["value"] - strategy.price()) < 5 * res["std_error"]
+    opts = list(strategy.options_list.values())
+    assert opts[0][1].MCprice == res["prices"][0]
@@ -0,0 +1,22 @@
+import numpy as np
+from positions import PositionStore
+
+
+def test_PositionStore_add_and_remove():
+    store = PositionStore(capacity=2)
+    store.add("a", 10, 100, 30, 0.2, True)
+    store.add("b", -5, 110, 30, 0.25, False)
+    store.add("c", 3, 120, 60, 0.3, True)
+    store.add("a", -10, 100, 30, 0.2, True)
+    assert store.labels == ["c", "b"]
+    assert store.index == {"c": 0, "b": 1}
+    assert np.allclose(store.amount, [3, -5])
+    assert list(store.is_call) == [True, False]
+
+
+def test_PositionStore_aggregate():
+    store = PositionStore()
+    store.add("a", 10, 100, 30, 0.2, True)
+    store.add("a", 5, 100, 30, 0.2, True)
+    store.add("b", -2, 110, 30, 0.25, False)
+    assert store.amount @ store.K == 15 * 100 - 2 * 110
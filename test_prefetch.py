@@ -0,0 +1,141 @@
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from api_connect import finance_api
+from market_service import MarketService
+from OptionClass import Strategy
+from pricing import bs_price_greeks
+from providers import OptionChainData, SnapshotProvider
+
+
+def fake_frame(strikes):
+    return pd.DataFrame({"contractSymbol": ["X"] * len(strikes),
+                         "lastTradeDate": pd.Timestamp("2021-01-13"),
+                         "strike": strikes, "lastPrice": 1.0,
+                         "impliedVolatility": 0.2, "inTheMoney": False,
+                         "contractSize": "REGULAR", "currency": "USD"})
+
+
+def test_prefetch_chains():
+    calls = []
+    lock = threading.Lock()
+
+    class FakeProvider(SnapshotProvider):
+        def option_chain(self, ticker, maturity):
+            with lock:
+                calls.append(maturity)
+            return OptionChainData(fake_frame([100., 110.]),
+                                   fake_frame([90., 100.]))
+
+    maturities = ["2021-02-19", "2021-03-19", "2021-04-16"]
+    api = finance_api("USD", provider=FakeProvider(
+        {"expiries": {"AAPL": maturities}}))
+    progress = []
+    prefetch = api.prefetch_chains("AAPL", max_workers=2,
+                                   progress=lambda d, t: progress.append(t))
+    prefetch.wait()
+    assert prefetch.finished() and prefetch.ready("2021-03-19")
+    assert sorted(calls) == maturities and progress == [3, 3, 3]
+    api.get_options_data("AAPL", "Put", "2021-04-16")
+    assert api.possible_values("AAPL", "Strike") == [90., 100.]
+    assert len(calls) == 3
+
+
+class ChainProvider(SnapshotProvider):
+    def option_chain(self, ticker, maturity):
+        return OptionChainData(fake_frame([90., 100., 110.]),
+                               fake_frame([90., 100., 110.]))
+
+
+def test_calibrate_during_prefetch():
+    maturities = [str(d.date()) for d in
+                  pd.date_range("2021-02-01", periods=300)]
+    api = finance_api("USD", provider=ChainProvider(
+        {"expiries": {"AAPL": maturities}}))
+    prefetch = api.prefetch_chains("AAPL", max_workers=4)
+    today = datetime(2021, 1, 13)
+    while not prefetch.finished():
+        api.calibrate_chains("AAPL", 100, 0.01, today=today)
+    prefetch.wait()
+    assert not prefetch.errors and len(api.chains) == 600
+
+
+def test_calibration_per_session():
+    service = MarketService(ChainProvider(
+        {"expiries": {"AAPL": ["2021-04-16"]}}))
+    first = finance_api("USD", service=service)
+    second = finance_api("USD", service=service)
+    today = datetime(2021, 1, 13)
+    first.calibrate_chains("AAPL", 100, 0.01, today=today)
+    second.calibrate_chains("AAPL", 100, 0.05, today=today)
+    vols = [api.implied_vol("AAPL", "2021-04-16", "Call", 110.)
+            for api in (first, second)]
+    assert vols[0] != vols[1] and 0 < vols[0] < 1
+    other = finance_api("USD", service=service)
+    assert other.implied_vol("AAPL", "2021-04-16", "Call", 110.) == 0.2
+
+
+def test_calibration_without_dividend_yield():
+    strikes = np.linspace(80, 120, 11)
+    prices = bs_price_greeks(100, strikes, 30, 0.5, 0.01, True)["BSprice"]
+    frame = fake_frame(strikes).assign(lastPrice=prices)
+
+    class Provider(SnapshotProvider):
+        def option_chain(self, ticker, maturity):
+            return OptionChainData(frame, frame)
+
+    strategy = Strategy("XYZ", "USD", provider=Provider({
+        "info": {"XYZ": {"currency": "USD", "bid": 100, "ask": 100,
+                         "previousClose": 100}},
+        "expiries": {"XYZ": ["2021-02-12"]}}))
+    assert strategy.q == 0
+    api = strategy.api
+    api.calibrate_chains("XYZ", 100, 0.01, strategy.q,
+                         today=datetime(2021, 1, 13))
+    vols = [api.implied_vol("XYZ", "2021-02-12", "Call", K) for K in strikes]
+    assert np.allclose(vols, 0.5)
+
+
+def test_prefetch_cancel():
+    started = threading.Event()
+    release = threading.Event()
+
+    class SlowProvider(ChainProvider):
+        def option_chain(self, ticker, maturity):
+            started.set()
+            release.wait(5)
+            return super().option_chain(ticker, maturity)
+
+    maturities = ["2021-02-19", "2021-03-19", "2021-04-16"]
+    api = finance_api("USD", provider=SlowProvider(
+        {"expiries": {"AAPL": maturities}}))
+    prefetch = api.prefetch_chains("AAPL", max_workers=1)
+    started.wait(5)
+    prefetch.cancel()
+    release.set()
+    prefetch.wait()
+    # the running maturity stops before its puts
+    assert prefetch.finished() and not prefetch.ready("2021-02-19")
+    assert not prefetch.ready("2021-04-16")
+    assert ("AAPL", "2021-02-19", "Call") in api.chains
+
+
+def test_release_during_prefetch():
+    release = threading.Event()
+
+    class SlowProvider(ChainProvider):
+        def option_chain(self, ticker, maturity):
+            release.wait(5)
+            return super().option_chain(ticker, maturity)
+
+    service = MarketService(SlowProvider(
+        {"expiries": {"AAPL": ["2021-02-19", "2021-03-19"]}}))
+    service.subscribe("AAPL")
+    api = finance_api("USD", service=service)
+    prefetch = api.prefetch_chains("AAPL", max_workers=1)
+    api.cancel_prefetch()
+    service.release("AAPL")
+    release.set()
+    prefetch.wait()
+    assert len(service.chains) == 0 and api.prefetch is None
@@ -0,0 +1,32 @@
+import numpy as np
+from pricing import bs_price_greeks, implied_vol, option_flags
+
+# Same two options as in test_Mytest.py, priced in one batched call
+
+res = bs_price_greeks([1900, 450], [1900, 495], [30, 60], [0.15, 0.22],
+                      [0, 0.02], option_flags(["Call", "Put"]))
+
+
+def test_bs_price_greeks_values():
+    assert np.allclose(np.round(res["BSprice"], 3), [32.594, 46.669])
+    assert np.allclose(np.round(res["Delta"], 3), [0.509, -0.838])
+    assert np.allclose(np.round(res["Vega"], 4), [2.1726, 0.4472])
+    assert np.allclose(np.round(res["Theta"], 4), [-0.5431, -0.0588])
+
+
+def test_bs_price_greeks_broadcast():
+    spots = np.linspace(1800, 2000, 41)
+    out = bs_price_greeks(spots[:, None], [1880, 1900, 1920], 30, 0.16, 0,
+                          True)
+    assert out["Gamma"].shape == (41, 3)
+    single = bs_price_greeks(spots[7], 1900, 30, 0.16, 0, True)
+    assert np.isclose(out["BSprice"][7, 1], single["BSprice"])
+
+
+def test_implied_vol():
+    sigma, converged = implied_vol(res["BSprice"], [1900, 450], [1900, 495],
+                                   [30, 60], [0, 0.02], [True, False])
+    assert converged.all() and np.allclose(sigma, [0.15, 0.22])
+    # below the intrinsic value, or past expiry
+    sigma, converged = implied_vol([1, 5], 100, 90, [30, 0], 0, True)
+    assert not converged.any() and np.isnan(sigma).all()
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from api_connect import finance_api
+from providers import RecordingProvider, SnapshotProvider, load_snapshot
+
+calls = pd.DataFrame({"contractSymbol": ["AAPL210416C00120000",
+                                         "AAPL210416C00130000"],
+                      "lastTradeDate": pd.to_datetime(
+                          ["2021-01-12 20:59", "2021-01-13 15:30"], utc=True),
+                      "strike": [120., 130.], "lastPrice": [13.1, 7.2],
+                      "impliedVolatility": [0.33, 0.31],
+                      "inTheMoney": [True, False],
+                      "contractSize": "REGULAR", "currency": "USD"})
+source = SnapshotProvider({
+    "info": {"AAPL": {"currency": "USD", "bid": 128.7, "ask": 128.9,
+                      "previousClose": 128.8, "dividendYield": 0.0063}},
+    "expiries": {"AAPL": ["2021-04-16"]},
+    "chains": {("AAPL", "2021-04-16", "Call"): calls,
+               ("AAPL", "2021-04-16", "Put"): calls.iloc[:0]},
+    "fx": {("USD", "EUR"): 0.82}})
+
+
+def test_snapshot_round_trip(tmp_path):
+    recorder = RecordingProvider(source)
+    api = finance_api("EUR", provider=recorder)
+    api.get_options_data("AAPL", "Call", "2021-04-16")
+    price = api.get_price("AAPL")
+    recorder.save(str(tmp_path))
+
+    replay = finance_api("EUR", provider=load_snapshot(str(tmp_path)))
+    assert np.isclose(replay.get_price("AAPL"), price)
+    assert replay.get_maturities("AAPL") == ["2021-04-16"]
+    assert replay.implied_vol("AAPL", "2021-04-16", "Call", 130) == 0.31
+    chain = replay.provider.chain("AAPL", "2021-04-16", "Call")
+    pd.testing.assert_frame_equal(chain, calls)
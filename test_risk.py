@@ -0,0 +1,42 @@
+import numpy as np
+from book import Book
+from fixtures import make_strategy
+from risk import GridShocks, HistoricalShocks, MonteCarloShocks, RiskEngine
+
+strategy = make_strategy(20)
+engine = RiskEngine.from_strategy(strategy, chunk_elements=1000)
+
+
+def test_RiskEngine_pnl():
+    shocks = GridShocks([-0.1, 0.1], [0.01], [0], [0, 5])
+    pnl = engine.pnl(shocks)
+    assert np.isclose(pnl[3], strategy.price(143, 5, 0.01)
+                      - strategy.price())
+    assert engine.pnl(GridShocks())[0] == 0
+
+
+def test_RiskEngine_run():
+    shocks = MonteCarloShocks(5000, days=1, vol=0.3, vol_of_vol=0.5,
+                              correlation=-0.5)
+    pnl = engine.pnl(shocks)
+    report = engine.run(shocks, levels=(0.95, 0.99), n_worst=5)
+    for level in (0.95, 0.99):
+        assert np.isclose(report["VaR"][level],
+                          -np.quantile(pnl, 1 - level))
+        tail = np.sort(pnl)[:int(np.ceil((1 - level) * len(pnl)))]
+        assert np.isclose(report["ES"][level], -tail.mean())
+    assert np.isclose(report["std"], pnl.std())
+    worst = report["worst"]
+    assert np.allclose(worst["P&L"], np.sort(pnl)[:5])
+    assert np.allclose(worst["spot"],
+                       shocks.chunk(0, 5000)["spot"][worst.index])
+
+
+def test_RiskEngine_historical_book():
+    closes = 130 * np.exp(np.cumsum(
+        np.random.default_rng(1).normal(0, 0.01, 300)))
+    book = Book("USD")
+    book.add_strategy(strategy)
+    book.add_strategy(make_strategy(5))
+    report = RiskEngine.from_book(book).run(HistoricalShocks(closes))
+    assert report["n"] == 299 and report["VaR"][0.99] > 0
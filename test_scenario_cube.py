@@ -0,0 +1,77 @@
+import numpy as np
+from fixtures import make_strategy
+from pricing import bs_price_greeks
+from scenario_cube import ScenarioCube
+
+
+def test_ScenarioCube_lookup_on_lattice():
+    cube = ScenarioCube(100, 0.01, 10, -0.1)
+    cube.add_legs([10, -5], [95, 105], [30, 20], [0.2, 0.25], [True, False])
+    forward = np.array([90, 100, 110.])
+    out = cube.lookup(forward, 4, 0.05)
+    res = bs_price_greeks(forward[:, None], [95, 105], np.array([26, 16]),
+                          np.array([0.25, 0.3]), 0.01, [True, False])
+    for name in ("BSprice", "Delta", "Vega"):
+        assert np.allclose(out[name], res[name] @ np.array([10, -5.]))
+
+
+def test_ScenarioCube_incremental_legs():
+    cube = ScenarioCube(100, 0, 5, 0)
+    cube.add_legs([10], [95], [30], [0.2], [True])
+    cube.add_legs([-10], [95], [30], [0.2], [True])
+    assert np.allclose(cube.values, 0)
+
+
+def built_cube(strategy):
+    # waits for the background build of the strategy cube
+    builder = strategy.cube_builder
+    builder.ready()
+    builder._thread.join()
+    return builder.ready()
+
+
+def test_CubeBuilder_lowest_vol_shift_is_finite():
+    strategy = make_strategy(10)
+    cube = built_cube(strategy)
+    forward = strategy.S_0 * np.array([0.9, 1, 1.1])
+    min_sigma = strategy.positions.sigma.min()
+    assert cube.vol_shifts[0] + min_sigma > 0
+    out = cube.lookup(forward, 2, cube.vol_shifts[0] + 0.002)
+    assert all(np.isfinite(v).all() for v in out.values())
+
+
+def test_CubeBuilder_existing_leg_with_other_sigma():
+    strategy = make_strategy(0)
+    strategy.use_cube = True
+    strategy.add_option(130, 30, 0.2, "Call", 10)
+    built_cube(strategy)
+    # the store keeps the first sigma, so the cube can not add the new one
+    strategy.add_option(130, 30, 0.35, "Call", 10)
+    assert strategy.cube_builder.cube is None
+    cube = built_cube(strategy)
+    grid = cube.lookup([strategy.S_0], 0, 0)
+    assert np.isclose(grid["BSprice"][0], strategy.price())
+
+
+def test_ScenarioCube_leg_expiring_inside():
+    # the values after the expiry are NaN, but not the days before it
+    cube = ScenarioCube(100, 0, 10, 0)
+    cube.add_legs([10], [95], [5], [0.2], [True])
+    assert np.isnan(cube.values[:, :, 6]).all()
+    out = cube.lookup([100.], 4, 0)
+    assert all(np.isfinite(v).all() for v in out.values())
+
+
+def test_ScenarioCube_chunked_legs():
+    legs = ([10, -5, 3], [95, 105, 100], [30, 20, 25], [0.2, 0.25, 0.3],
+            [True, False, True])
+    cube, chunked = ScenarioCube(100, 0, 5, 0), ScenarioCube(100, 0, 5, 0)
+    cube.add_legs(*legs)
+    chunked.add_legs(*legs, chunk_size=2)
+    assert np.allclose(cube.values, chunked.values)
+
+
+def test_CubeBuilder_max_legs():
+    strategy = make_strategy(30)
+    builder = strategy.cube_builder
+    assert builder.ready() is None and builder._thread is None
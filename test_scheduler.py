@@ -0,0 +1,56 @@
+import threading
+import time
+from scheduler import UpdateScheduler, classify
+
+
+class FakeDocument:
+    # runs the callbacks when pump() is called, like the event loop would
+    def __init__(self):
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    def add_timeout_callback(self, callback, timeout_milliseconds):
+        with self.lock:
+            self.callbacks.append(callback)
+
+    def add_next_tick_callback(self, callback):
+        self.add_timeout_callback(callback, 0)
+
+    def pump(self):
+        with self.lock:
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+def test_classify():
+    old = {"rate": 0, "shift_time": 0, "shift_vol": 0, "greek": "Delta"}
+    assert classify(old, dict(old, greek="Gamma")) == {"greek"}
+    assert classify(old, dict(old, shift_vol=0.1, rate=0.01))\
+        == {"shift", "rate"}
+    assert classify(None, old) == {"rate", "shift", "greek"}
+
+
+def test_UpdateScheduler_coalesce_and_drop():
+    doc = FakeDocument()
+    computed, applied = [], []
+    release = threading.Event()
+
+    def compute(state, changes):
+        release.wait(5)
+        computed.append(state["shift_time"])
+
+    scheduler = UpdateScheduler(
+        doc, compute, lambda s, c, r: applied.append(s["shift_time"]))
+    for i in range(10):
+        scheduler.request({"shift_time": i})
+    doc.pump()
+    scheduler.request({"shift_time": 20})
+    release.set()
+    for _ in range(500):
+        if applied:
+            break
+        time.sleep(0.01)
+        doc.pump()
+    assert computed == [9, 20] and applied == [20]
+    assert scheduler.dropped == 1
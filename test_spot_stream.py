@@ -0,0 +1,59 @@
+from api_connect import finance_api
+from fixtures import make_strategy, stub_market
+from market_service import MarketService
+from providers import SnapshotProvider
+from spot_stream import FileSpotSource, PollingSpotSource, PushSpotSource,\
+    SpotStreamer
+
+
+def test_FileSpotSource(tmp_path):
+    path = tmp_path / "spots.csv"
+    path.write_text("AAPL,130.5\nMSFT,220\nAAPL,131\n")
+    source = FileSpotSource(str(path))
+    assert source.latest("AAPL") == 131 and source.latest("TSLA") is None
+
+
+def test_SpotStreamer():
+    strategy = make_strategy(10)
+    source = PushSpotSource()
+    updates = []
+    streamer = SpotStreamer(strategy, source,
+                            lambda spot, agg: updates.append((spot, agg)))
+    source.push("AAPL", 135)
+    assert streamer.tick()
+    streamer.executor.shutdown(wait=True)
+    spot, aggregates = updates[0]
+    assert spot == 135 and strategy.S_0 == 135
+    assert abs(aggregates["Delta"] - strategy.Delta(135)) < 1e-6
+    streamer._in_flight = True
+    assert not streamer.tick() and streamer.stats["dropped"] == 1
+
+
+def test_SpotStreamer_errors():
+    class FailingSource:
+        def latest(self, ticker):
+            raise ConnectionError("feed down")
+
+    streamer = SpotStreamer(make_strategy(1), FailingSource())
+    assert streamer.tick()
+    streamer.executor.shutdown(wait=True)
+    assert streamer.stats["errors"] == 1 and not streamer._in_flight
+    assert isinstance(streamer.stats["last_error"], ConnectionError)
+    assert streamer.stats["reprices"] == 0
+
+
+def test_PollingSpotSource_shared_quote():
+    calls = []
+
+    class CountingProvider(SnapshotProvider):
+        def info(self, ticker):
+            calls.append(ticker)
+            return super().info(ticker)
+
+    service = MarketService(CountingProvider(stub_market))
+    apis = [finance_api("EUR", service=service) for i in range(3)]
+    apis[0].get_info("AAPL")
+    sources = [PollingSpotSource(api) for api in apis]
+    assert [s.latest("AAPL") for s in sources] == [130] * 3
+    # one quote request for all the sessions, the info cache being kept
+    assert len(calls) == 2 and service.cache["info"].get("AAPL")
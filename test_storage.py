@@ -0,0 +1,72 @@
+from datetime import date
+import numpy as np
+import pytest
+from fixtures import make_strategy, stub_market
+from providers import SnapshotProvider
+from storage import load_library, load_strategy, save_library, save_strategy
+
+
+def test_library_revalue(tmp_path):
+    strategies = [make_strategy(n) for n in (3, 0, 12)]
+    strategies[1].set_stock_quantity(4)
+    save_library(strategies, str(tmp_path), ["a", "b", "c"])
+    library = load_library(str(tmp_path))
+    assert len(library) == 3 and library.find("c") == 2
+    assert len(library.legs(2)["K"]) == 12
+    res = library.revalue()
+    assert np.allclose(res["BSprice"], [s.price() for s in strategies])
+    res = library.revalue({"AAPL": 140}, 5, 0.01)
+    assert np.allclose(res.loc["c", "Gamma"],
+                       strategies[2].Gamma(140, 5, 0.01))
+
+
+def test_save_load_strategy(tmp_path):
+    strategy = make_strategy(6)
+    strategy.add_option(120, 45, 0.3, "Put", 2, "2021-05-01")
+    save_strategy(strategy, str(tmp_path), "mine")
+    loaded = load_strategy(str(tmp_path), "mine",
+                           provider=SnapshotProvider(stub_market))
+    assert loaded.r == strategy.r and loaded.q == strategy.q
+    assert loaded.positions.labels == strategy.positions.labels
+    assert list(loaded.positions.maturity_date) ==\
+        list(strategy.positions.maturity_date)
+    assert np.isclose(loaded.price(), strategy.price())
+    # legs added afterwards merge with the loaded ones
+    loaded.add_option(120, 45, 0.3, "Put", -2)
+    assert len(loaded.positions) == 6
+
+
+def test_load_decays_maturities(tmp_path):
+    strategy = make_strategy(4)
+    save_strategy(strategy, str(tmp_path), "mine", date(2021, 3, 1))
+    with pytest.raises(KeyError):
+        load_strategy(str(tmp_path), "other")
+    loaded = load_strategy(str(tmp_path), "mine", SnapshotProvider(
+        stub_market), today=date(2021, 3, 11))
+    assert np.allclose(loaded.positions.T, strategy.positions.T - 10)
+    assert np.isclose(loaded.price(), strategy.price(0, 10))
+    library = load_library(str(tmp_path), today=date(2021, 3, 11))
+    assert np.isclose(library.revalue()["BSprice"].iloc[0],
+                      strategy.price(0, 10))
+    # the labels follow the decayed maturities
+    assert loaded.positions.labels[0] == "Put , strike 100, 20 days"
+    loaded.add_option(100, 20, 0.2, "Put", -10)
+    assert len(loaded.positions) == 3
+
+
+def test_load_expired_legs(tmp_path):
+    strategy = make_strategy(4)
+    strategy.add_option(120, 60, 0.3, "Put", 2)
+    save_strategy(strategy, str(tmp_path), "mine", date(2021, 3, 1))
+    library = load_library(str(tmp_path), today=date(2021, 4, 10))
+    res = library.revalue()
+    # the legs of 30 days are settled at their intrinsic value
+    p = strategy.positions
+    payoff = np.maximum(np.where(p.is_call, 130 - p.K, p.K - 130), 0)
+    loaded = library.strategy(0, SnapshotProvider(stub_market))
+    assert len(loaded.positions) == 1 and len(library.expired(0)) == 4
+    assert loaded.positions.labels == ["Put , strike 120, 20 days"]
+    assert res["Settled legs"].iloc[0] == 4
+    assert np.isclose(res["BSprice"].iloc[0],
+                      payoff[:4] @ p.amount[:4] + loaded.price())
+    assert np.isclose(res["Gamma"].iloc[0], loaded.Gamma())
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from chain_store import ChainStore
+from fixtures import make_strategy
+from pricing import bs_price_greeks
+from strategy_search import StrategySearch, add_to_strategy
+
+strikes = np.arange(100, 161, 5.)
+store = ChainStore()
+for maturity, T in (("2021-04-16", 30), ("2021-05-16", 60)):
+    for option_type in ("Call", "Put"):
+        prices = bs_price_greeks(130, strikes, T, 0.25, 0,
+                                 option_type == "Call")["BSprice"]
+        store.put("AAPL", maturity, option_type,
+                  pd.DataFrame({"Strike": strikes, "Last Price": prices,
+                                "Implied Volatility": 0.25}))
+search = StrategySearch(store, "AAPL", 130, today=pd.Timestamp("2021-03-17"))
+
+
+def test_search_vertical():
+    res = search.search("vertical", "max_profit", top=3, max_cost=3)
+    assert len(res) == 3 and search.evaluated == 8 * 78
+    best = res[0]
+    assert best["cost"] <= 3 and len(best["legs"]) == 2
+    K = [leg[0] for leg in best["legs"]]
+    assert np.isclose(best["max_profit"] - best["max_loss"],
+                      abs(K[1] - K[0]))
+    strategy = make_strategy(0)
+    strategy.r = 0
+    add_to_strategy(strategy, best)
+    assert np.isclose(strategy.price(), best["cost"])
+
+
+def test_search_pruning():
+    narrow = StrategySearch(store, "AAPL", 130, max_width=10,
+                            today=pd.Timestamp("2021-03-17"))
+    res = narrow.search("condor", "pop", top=5, max_risk=10)
+    search.search("condor", "pop", top=5)
+    assert narrow.evaluated < search.evaluated / 10
+    for r in res:
+        K = [leg[0] for leg in r["legs"]]
+        assert K[-1] - K[0] <= 10 and r["max_loss"] >= -10
+        assert len(r["breakevens"]) == 2
+
+
+def test_search_calendar():
+    res = search.search("calendar", "expected_pnl", top=2)
+    legs = res[0]["legs"]
+    assert legs[0][0] == legs[1][0] and legs[0][1] < legs[1][1]
+    assert res[0]["horizon"] == 30
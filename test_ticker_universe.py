@@ -0,0 +1,13 @@
+import os
+import shutil
+from ticker_universe import TickerUniverse, default_path
+
+
+def test_TickerUniverse_sidecar(tmp_path):
+    path = str(tmp_path / "tickers.xlsx")
+    shutil.copy(default_path, path)
+    universe = TickerUniverse(path)
+    assert os.path.exists(str(tmp_path / "tickers.pkl"))
+    assert universe.tickers("Indices")["S&P 500"] == "^GSPC"
+    assert TickerUniverse(path).by_exchange == universe.by_exchange
+    assert universe.symbol("10x Genomics, Inc.") == "TXG"
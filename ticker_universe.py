@@ -0,0 +1,59 @@
+import os
+import pickle
+import threading
+
+default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "tickers.xlsx")
+
+
+class TickerUniverse:
+    # exchanges and their {name: symbol} dicts, read from tickers.xlsx once
+    # and kept in a pickle next to it, regenerated when the workbook changes
+
+    def __init__(self, path=default_path, cache_path=None):
+        self.path = path
+        self.cache_path = cache_path or os.path.splitext(path)[0] + ".pkl"
+        self.by_exchange = self._load()
+        self.by_name = {}
+        for names in self.by_exchange.values():
+            self.by_name.update(names)
+
+    def _load(self):
+        try:
+            if os.path.getmtime(self.cache_path) >= os.path.getmtime(
+                    self.path):
+                with open(self.cache_path, "rb") as f:
+                    return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+        import pandas as pd
+        sheets = pd.read_excel(self.path, sheet_name=None)
+        out = {exchange: dict(zip(df["Name"], df["Symbol"]))
+               for exchange, df in sheets.items()}
+        try:
+            with open(self.cache_path, "wb") as f:
+                pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass
+        return out
+
+    def exchanges(self):
+        return list(self.by_exchange.keys())
+
+    def tickers(self, exchange):
+        return self.by_exchange[exchange]
+
+    def symbol(self, name):
+        return self.by_name[name]
+
+
+_universes = {}
+_lock = threading.Lock()
+
+
+def get_universe(path=default_path):
+    # one universe per workbook for the whole process, loaded on first use
+    with _lock:
+        if path not in _universes:
+            _universes[path] = TickerUniverse(path)
+        return _universes[path]